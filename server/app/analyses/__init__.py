@@ -1,20 +1,57 @@
-from typing import Dict
+from typing import Dict, List, Type
 
 from . import analysis
 from .series import SeriesModel
 from ..analyses_settings import experiment_analyses, computer_analyses
+from ..enums import INDICATORS
+
+
+def _route(analyses: List[Type[analysis.Analysis]],
+           data: Dict[str, SeriesModel]) -> Dict[Type[analysis.Analysis], Dict[str, SeriesModel]]:
+    by_type = {ans.indicator_type: ans for ans in analyses}
+    res = {}
+    for ind, s in data.items():
+        ind_type = ind.split('.')[0]
+        if ind_type in by_type:
+            ans = by_type[ind_type]
+        elif ind_type not in INDICATORS and None in by_type:
+            ans = by_type[None]
+        else:
+            continue
+
+        res.setdefault(ans, {})[ind] = s
+
+    return res
 
 
 class AnalysisManager:
     @staticmethod
     def track(run_uuid: str, data: Dict[str, SeriesModel]):
-        for ans in experiment_analyses:
-            ans.get_or_create(run_uuid).track(data)
+        for ans, ans_data in _route(experiment_analyses, data).items():
+            ans.get_or_create(run_uuid).track(ans_data)
 
     @staticmethod
     def track_computer(computer_uuid: str, data: Dict[str, SeriesModel]):
-        for ans in computer_analyses:
-            ans.get_or_create(computer_uuid).track(data)
+        for ans, ans_data in _route(computer_analyses, data).items():
+            ans.get_or_create(computer_uuid).track(ans_data)
+
+    @staticmethod
+    def merge_tracks(tracks: List[Dict[str, SeriesModel]]) -> Dict[str, SeriesModel]:
+        """
+        Joins the series of several pushes, in order, so they are tracked in one update
+        """
+        if len(tracks) == 1:
+            return tracks[0]
+
+        res = {}
+        for track in tracks:
+            for ind, s in track.items():
+                if ind not in res:
+                    res[ind] = {'step': [], 'value': []}
+                res[ind]['step'].extend(s['step'])
+                res[ind]['value'].extend(s['value'])
+
+        return res
 
     @staticmethod
     def get_handlers():
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 
 from .series import SeriesModel
 
@@ -8,6 +8,10 @@ DB_INDEXES = []
 
 
 class Analysis:
+    # indicators are routed to analyses by the part of their name before the first `.`;
+    # the one with `None` gets the experiment indicators of types outside `INDICATORS`
+    indicator_type: Optional[str] = None
+
     def track(self, data: Dict[str, SeriesModel]) -> None:
         raise NotImplementedError
 
@@ -0,0 +1,64 @@
+"""
+Binary encoding of analysis responses, for clients that ask for `MIMETYPE`.
+
+The response is a little-endian `uint32` header length, a JSON header, and the arrays of the data
+as raw little-endian columns, each starting at a multiple of `ALIGNMENT` bytes so that it can be
+read as a typed array in place. In the header, each array is replaced by `{"__column__": i}`,
+and `columns[i]` gives its `dtype`, `offset` from the start of the columns, and `length`.
+"""
+import json
+import struct
+from typing import Any, Dict, List
+
+import numpy as np
+
+MIMETYPE = 'application/vnd.labml.columns'
+ALIGNMENT = 8
+
+_HEADER_LENGTH = struct.Struct('<I')
+
+# dtypes that typed arrays can read; others, including 64-bit integers, are sent as float64
+_DTYPES = {'f': {4: '<f4', 8: '<f8'}, 'i': {4: '<i4'}, 'u': {4: '<u4'}}
+
+
+def _pad(length: int) -> int:
+    return -length % ALIGNMENT
+
+
+def _get_dtype(dtype: np.dtype) -> str:
+    return _DTYPES.get(dtype.kind, {}).get(dtype.itemsize, '<f8')
+
+
+def encode(data: Dict[str, Any]) -> bytes:
+    columns: List[Dict[str, Any]] = []
+    buffers: List[bytes] = []
+    offset = 0
+
+    def extract(value):
+        nonlocal offset
+
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value.ravel(), dtype=_get_dtype(value.dtype))
+            columns.append({'dtype': value.dtype.str, 'offset': offset, 'length': len(value)})
+            buffers.append(value.tobytes())
+            padding = _pad(value.nbytes)
+            if padding:
+                buffers.append(b'\0' * padding)
+            offset += value.nbytes + padding
+
+            return {'__column__': len(columns) - 1}
+        elif isinstance(value, np.generic):
+            return value.item()
+        elif isinstance(value, dict):
+            return {k: extract(v) for k, v in value.items()}
+        elif isinstance(value, (list, tuple)):
+            return [extract(v) for v in value]
+        else:
+            return value
+
+    header = extract(data)
+    header['columns'] = columns
+    header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header += b' ' * _pad(_HEADER_LENGTH.size + len(header))
+
+    return b''.join([_HEADER_LENGTH.pack(len(header)), header] + buffers)
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from flask import make_response, request
 from labml_db import Model, Index
@@ -8,12 +8,15 @@ from app.utils import format_rv
 from app.logging import logger
 from app.enums import COMPUTEREnums
 from ..analysis import Analysis
-from ..series import SeriesModel, Series
+from ..serializer import ArraySerializer
+from ..series import SeriesModel, Series, SeriesQuery
 from ..series_collection import SeriesCollection
 from ..preferences import Preferences
+from .. import responses
+from .. import utils
 
 
-@Analysis.db_model(PickleSerializer, 'CPU')
+@Analysis.db_model(ArraySerializer, 'CPU')
 class CPUModel(Model['CPUModel'], SeriesCollection):
     pass
 
@@ -34,22 +37,19 @@ class CPUPreferencesIndex(Index['CPUPreferences']):
 
 
 class CPUAnalysis(Analysis):
+    indicator_type = COMPUTEREnums.CPU
+
     cpu: CPUModel
 
     def __init__(self, data):
         self.cpu = data
 
     def track(self, data: Dict[str, SeriesModel]):
-        res: Dict[str, SeriesModel] = {}
-        for ind, s in data.items():
-            ind_type = ind.split('.')[0]
-            if ind_type == COMPUTEREnums.CPU:
-                res[ind] = s
-
-        self.cpu.track(res)
+        self.cpu.track(data)
 
-    def get_tracking(self):
+    def get_tracking(self, query: Optional[SeriesQuery] = None):
         res = []
+        loaded = []
         summary = []
         for ind, track in self.cpu.tracking.items():
             name = ind.split('.')
@@ -57,16 +57,21 @@ class CPUAnalysis(Analysis):
             if any(x in ['freq', 'system', 'idle', 'user'] for x in name):
                 continue
 
-            series: Dict[str, Any] = Series().load(track).detail
+            s = Series().load(track)
+            if len(s):
+                loaded.append(s)
+
+            series: Dict[str, Any] = s.select(query).detail
             series['name'] = '.'.join(name)
 
             res.append(series)
 
-        if res:
-            mean_value = [sum(x) / len(x) for x in zip(*[s['value'] for s in res])]
-            mean_smoothed = [sum(x) / len(x) for x in zip(*[s['smoothed'] for s in res])]
-            step = res[0]['step']
-            summary = [{'step': step, 'value': mean_value, 'smoothed': mean_smoothed, 'name': 'cpu.perc.total'}]
+        if loaded:
+            # from the full buffers, so that the cores are averaged at the same steps
+            # before a delta or downsampling picks different buckets for each of them
+            total: Dict[str, Any] = Series.mean(loaded).select(query).detail
+            total['name'] = 'cpu.perc.total'
+            summary = [total]
 
         res.sort(key=lambda s: s['name'])
 
@@ -92,19 +97,14 @@ class CPUAnalysis(Analysis):
 
 @Analysis.route('GET', 'cpu/<session_uuid>')
 def get_cpu_tracking(session_uuid: str) -> Any:
-    track_data = []
-    summary_data = []
-    status_code = 400
-
     ans = CPUAnalysis.get_or_create(session_uuid)
-    if ans:
-        track_data, summary_data = ans.get_tracking()
-        status_code = 200
 
-    response = make_response(format_rv({'series': track_data, 'insights': [], 'summary': summary_data}))
-    response.status_code = status_code
+    def render():
+        track_data, summary_data = ans.get_tracking(utils.get_series_query(request.args))
 
-    return response
+        return {'series': track_data, 'insights': [], 'summary': summary_data}
+
+    return responses.get_response(ans.cpu, render)
 
 
 @Analysis.route('GET', 'cpu/preferences/<session_uuid>')
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from flask import jsonify, make_response, request
 from labml_db import Model, Index
@@ -9,12 +9,15 @@ from app.utils import format_rv
 from app.logging import logger
 from app.enums import COMPUTEREnums
 from ..analysis import Analysis
-from ..series import SeriesModel, Series
+from ..serializer import ArraySerializer
+from ..series import SeriesModel, Series, SeriesQuery
 from ..series_collection import SeriesCollection
 from ..preferences import Preferences
+from .. import responses
+from .. import utils
 
 
-@Analysis.db_model(PickleSerializer, 'Process')
+@Analysis.db_model(ArraySerializer, 'Process')
 class ProcessModel(Model['ProcessModel'], SeriesCollection):
     pass
 
@@ -35,25 +38,21 @@ class ProcessPreferencesIndex(Index['ProcessPreferences']):
 
 
 class ProcessAnalysis(Analysis):
+    indicator_type = COMPUTEREnums.PROCESS
+
     process: ProcessModel
 
     def __init__(self, data):
         self.process = data
 
     def track(self, data: Dict[str, SeriesModel]):
-        res: Dict[str, SeriesModel] = {}
-        for ind, s in data.items():
-            ind_type = ind.split('.')[0]
-            if ind_type == COMPUTEREnums.PROCESS:
-                res[ind] = s
-
-        self.process.track(res)
+        self.process.track(data)
 
-    def get_tracking(self):
+    def get_tracking(self, query: Optional[SeriesQuery] = None):
         res = []
         for ind, track in self.process.tracking.items():
             name = ind.split('.')
-            series: Dict[str, Any] = Series().load(track).detail
+            series: Dict[str, Any] = Series().load(track).select(query).detail
             series['name'] = '.'.join(name)
 
             res.append(series)
@@ -82,18 +81,14 @@ class ProcessAnalysis(Analysis):
 
 @Analysis.route('GET', 'process/<session_uuid>')
 def get_process_tracking(session_uuid: str) -> Any:
-    track_data = []
-    status_code = 400
-
     ans = ProcessAnalysis.get_or_create(session_uuid)
-    if ans:
-        track_data = ans.get_tracking()
-        status_code = 200
 
-    response = make_response(format_rv({'series': track_data, 'insights': [], 'summary': track_data}))
-    response.status_code = status_code
+    def render():
+        track_data = ans.get_tracking(utils.get_series_query(request.args))
 
-    return response
+        return {'series': track_data, 'insights': [], 'summary': track_data}
+
+    return responses.get_response(ans.process, render)
 
 
 @Analysis.route('GET', 'process/preferences/<session_uuid>')
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def get_buckets(length: int, buckets: int) -> np.ndarray:
+    """
+    Bucket index of each of `length` points, split into `buckets` contiguous buckets of near equal size
+    """
+    edges = np.linspace(0, length, buckets + 1).astype(np.int64)
+
+    return np.repeat(np.arange(buckets), np.diff(edges))
+
+
+def _first_per_bucket(is_selected: np.ndarray, bucket: np.ndarray) -> np.ndarray:
+    idx = np.flatnonzero(is_selected)
+    selected = bucket[idx]
+    is_first = np.empty(len(idx), dtype=bool)
+    is_first[:1] = True
+    np.not_equal(selected[1:], selected[:-1], out=is_first[1:])
+
+    return idx[is_first]
+
+
+def _starts(bucket: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.diff(bucket, prepend=-1))
+
+
+def min_max(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices of the minimum and the maximum of each of `points // 2` buckets
+    """
+    if points >= len(y):
+        return np.arange(len(y))
+
+    bucket = get_buckets(len(y), max(1, points // 2))
+    starts = _starts(bucket)
+
+    mins = _first_per_bucket(y == np.minimum.reduceat(y, starts)[bucket], bucket)
+    maxs = _first_per_bucket(y == np.maximum.reduceat(y, starts)[bucket], bucket)
+
+    return np.unique(np.concatenate((mins, maxs)))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices picked by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. From every bucket in between it picks
+    the point making the largest triangle with the neighbouring buckets.
+    The left corner is the previous bucket's mean rather than its selected point,
+    which lets all buckets be evaluated at once.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    bucket = get_buckets(n - 2, points - 2)
+    starts = _starts(bucket)
+    counts = np.bincount(bucket)
+
+    px = x[1:-1]
+    py = y[1:-1]
+    mean_x = np.add.reduceat(px, starts) / counts
+    mean_y = np.add.reduceat(py, starts) / counts
+
+    ax = np.concatenate((x[:1], mean_x[:-1]))[bucket]
+    ay = np.concatenate((y[:1], mean_y[:-1]))[bucket]
+    cx = np.concatenate((mean_x[1:], x[-1:]))[bucket]
+    cy = np.concatenate((mean_y[1:], y[-1:]))[bucket]
+
+    area = np.abs((ax - cx) * (py - ay) - (ax - px) * (cy - ay))
+    best = _first_per_bucket(area == np.maximum.reduceat(area, starts)[bucket], bucket)
+
+    return np.concatenate(([0], best + 1, [n - 1]))
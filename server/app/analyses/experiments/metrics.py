@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from flask import make_response, request
 from labml_db import Model, Index
@@ -6,18 +6,20 @@ from labml_db.serializer.pickle import PickleSerializer
 from labml_db.serializer.yaml import YamlSerializer
 
 from app.logging import logger
-from app.enums import INDICATORS
 from ..analysis import Analysis
-from ..series import SeriesModel, Series
+from ..serializer import ArraySerializer
+from ..series import SeriesModel, Series, SeriesQuery, LOD_LEVELS
 from ..series_collection import SeriesCollection
 from ..preferences import Preferences
+from .. import responses
+from .. import utils
 from app.utils import format_rv
 from app.utils import mix_panel
 
 
-@Analysis.db_model(PickleSerializer, 'metrics')
+@Analysis.db_model(ArraySerializer, 'metrics')
 class MetricsModel(Model['MetricsModel'], SeriesCollection):
-    pass
+    lod_levels = LOD_LEVELS
 
 
 @Analysis.db_model(PickleSerializer, 'metrics_preferences')
@@ -42,19 +44,13 @@ class MetricsAnalysis(Analysis):
         self.metrics = data
 
     def track(self, data: Dict[str, SeriesModel]):
-        res = {}
-        for ind, s in data.items():
-            ind_type = ind.split('.')[0]
-            if ind_type not in INDICATORS:
-                res[ind] = s
-
-        self.metrics.track(res)
+        self.metrics.track(data)
 
-    def get_tracking(self):
+    def get_tracking(self, query: Optional[SeriesQuery] = None):
         res = []
         for ind, track in self.metrics.tracking.items():
             name = ind.split('.')
-            series: Dict[str, Any] = Series().load(track).detail
+            series: Dict[str, Any] = Series().load(track).select(query).detail
             series['name'] = '.'.join(name)
 
             res.append(series)
@@ -84,18 +80,12 @@ class MetricsAnalysis(Analysis):
 @mix_panel.MixPanelEvent.time_this(None)
 @Analysis.route('GET', 'metrics/<run_uuid>')
 def get_metrics_tracking(run_uuid: str) -> Any:
-    track_data = []
-    status_code = 400
-
     ans = MetricsAnalysis.get_or_create(run_uuid)
-    if ans:
-        track_data = ans.get_tracking()
-        status_code = 200
 
-    response = make_response(format_rv({'series': track_data, 'insights': []}))
-    response.status_code = status_code
+    def render():
+        return {'series': ans.get_tracking(utils.get_series_query(request.args)), 'insights': []}
 
-    return response
+    return responses.get_response(ans.metrics, render)
 
 
 @Analysis.route('GET', 'metrics/preferences/<run_uuid>')
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from flask import make_response, request
 from labml_db import Model, Index
@@ -10,13 +10,15 @@ from app.utils import mix_panel
 from app.logging import logger
 from app.enums import SeriesEnums
 from ..analysis import Analysis
-from ..series import SeriesModel
+from ..serializer import ArraySerializer
+from ..series import SeriesModel, SeriesQuery
 from ..series_collection import SeriesCollection
 from ..preferences import Preferences
+from .. import responses
 from .. import utils
 
 
-@Analysis.db_model(PickleSerializer, 'outputs')
+@Analysis.db_model(ArraySerializer, 'outputs')
 class OutputsModel(Model['OutputsModel'], SeriesCollection):
     pass
 
@@ -37,27 +39,23 @@ class OutputsIndex(Index['Outputs']):
 
 
 class OutputsAnalysis(Analysis):
+    indicator_type = SeriesEnums.MODULE
+
     outputs: OutputsModel
 
     def __init__(self, data):
         self.outputs = data
 
     def track(self, data: Dict[str, SeriesModel]):
-        res = {}
-        for ind, s in data.items():
-            ind_type = ind.split('.')[0]
-            if ind_type == SeriesEnums.MODULE:
-                res[ind] = s
-
-        self.outputs.track(res)
+        self.outputs.track(data)
 
     def get_track_summaries(self):
         res = self.outputs.get_track_summaries()
 
         return res
 
-    def get_tracking(self):
-        res = self.outputs.get_tracks()
+    def get_tracking(self, query: Optional[SeriesQuery] = None):
+        res = self.outputs.get_tracks(query)
 
         res.sort(key=lambda s: s['mean'], reverse=True)
 
@@ -86,20 +84,14 @@ class OutputsAnalysis(Analysis):
 @mix_panel.MixPanelEvent.time_this(None)
 @Analysis.route('GET', 'outputs/<run_uuid>')
 def get_modules_tracking(run_uuid: str) -> Any:
-    track_data = []
-    summary_data = []
-    status_code = 400
-
     ans = OutputsAnalysis.get_or_create(run_uuid)
-    if ans:
-        track_data = ans.get_tracking()
-        summary_data = ans.get_track_summaries()
-        status_code = 200
 
-    response = make_response(format_rv({'series': track_data, 'insights': [], 'summary': summary_data}))
-    response.status_code = status_code
+    def render():
+        return {'series': ans.get_tracking(utils.get_series_query(request.args)),
+                'insights': [],
+                'summary': ans.get_track_summaries()}
 
-    return response
+    return responses.get_response(ans.outputs, render)
 
 
 @Analysis.route('GET', 'outputs/preferences/<run_uuid>')
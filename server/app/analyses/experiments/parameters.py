@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from flask import make_response, request
 from labml_db import Model, Index
@@ -10,13 +10,15 @@ from app.utils import mix_panel
 from app.logging import logger
 from app.enums import SeriesEnums
 from ..analysis import Analysis
-from ..series import SeriesModel
+from ..serializer import ArraySerializer
+from ..series import SeriesModel, SeriesQuery
 from ..series_collection import SeriesCollection
 from ..preferences import Preferences
+from .. import responses
 from .. import utils
 
 
-@Analysis.db_model(PickleSerializer, 'parameters')
+@Analysis.db_model(ArraySerializer, 'parameters')
 class ParametersModel(Model['ParametersModel'], SeriesCollection):
     pass
 
@@ -37,27 +39,23 @@ class ParametersIndex(Index['Parameters']):
 
 
 class ParametersAnalysis(Analysis):
+    indicator_type = SeriesEnums.PARAM
+
     parameters: ParametersModel
 
     def __init__(self, data):
         self.parameters = data
 
     def track(self, data: Dict[str, SeriesModel]):
-        res = {}
-        for ind, s in data.items():
-            ind_type = ind.split('.')[0]
-            if ind_type == SeriesEnums.PARAM:
-                res[ind] = s
-
-        self.parameters.track(res)
+        self.parameters.track(data)
 
     def get_track_summaries(self):
         res = self.parameters.get_track_summaries()
 
         return res
 
-    def get_tracking(self):
-        res = self.parameters.get_tracks()
+    def get_tracking(self, query: Optional[SeriesQuery] = None):
+        res = self.parameters.get_tracks(query)
 
         res.sort(key=lambda s: s['mean'], reverse=True)
 
@@ -86,20 +84,14 @@ class ParametersAnalysis(Analysis):
 @mix_panel.MixPanelEvent.time_this(None)
 @Analysis.route('GET', 'parameters/<run_uuid>')
 def get_params_tracking(run_uuid: str) -> Any:
-    track_data = []
-    summary_data = []
-    status_code = 400
-
     ans = ParametersAnalysis.get_or_create(run_uuid)
-    if ans:
-        track_data = ans.get_tracking()
-        summary_data = ans.get_track_summaries()
-        status_code = 200
 
-    response = make_response(format_rv({'series': track_data, 'insights': [], 'summary': summary_data}))
-    response.status_code = status_code
+    def render():
+        return {'series': ans.get_tracking(utils.get_series_query(request.args)),
+                'insights': [],
+                'summary': ans.get_track_summaries()}
 
-    return response
+    return responses.get_response(ans.parameters, render)
 
 
 @Analysis.route('GET', 'parameters/preferences/<run_uuid>')
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from flask import make_response, request
 from labml_db import Model, Index
@@ -8,14 +8,17 @@ from labml_db.serializer.yaml import YamlSerializer
 from app.logging import logger
 from app.enums import SeriesEnums
 from ..analysis import Analysis
-from ..series import SeriesModel
+from ..serializer import ArraySerializer
+from ..series import SeriesModel, SeriesQuery
 from ..series_collection import SeriesCollection
 from ..preferences import Preferences
+from .. import responses
+from .. import utils
 from app.utils import format_rv
 from app.utils import mix_panel
 
 
-@Analysis.db_model(PickleSerializer, 'time_tracking')
+@Analysis.db_model(ArraySerializer, 'time_tracking')
 class TimeTrackingModel(Model['TimeTrackingModel'], SeriesCollection):
     pass
 
@@ -36,22 +39,18 @@ class TimeTrackingIndex(Index['TimeTracking']):
 
 
 class TimeTrackingAnalysis(Analysis):
+    indicator_type = SeriesEnums.TIME
+
     time_tracking: TimeTrackingModel
 
     def __init__(self, data):
         self.time_tracking = data
 
     def track(self, data: Dict[str, SeriesModel]):
-        res = {}
-        for ind, s in data.items():
-            ind_type = ind.split('.')[0]
-            if ind_type == SeriesEnums.TIME:
-                res[ind] = s
-
-        self.time_tracking.track(res)
+        self.time_tracking.track(data)
 
-    def get_tracking(self):
-        res = self.time_tracking.get_tracks()
+    def get_tracking(self, query: Optional[SeriesQuery] = None):
+        res = self.time_tracking.get_tracks(query)
 
         res.sort(key=lambda s: s['name'])
 
@@ -78,18 +77,12 @@ class TimeTrackingAnalysis(Analysis):
 @mix_panel.MixPanelEvent.time_this(None)
 @Analysis.route('GET', 'times/<run_uuid>')
 def get_times_tracking(run_uuid: str) -> Any:
-    track_data = []
-    status_code = 400
-
     ans = TimeTrackingAnalysis.get_or_create(run_uuid)
-    if ans:
-        track_data = ans.get_tracking()
-        status_code = 200
 
-    response = make_response(format_rv({'series': track_data, 'insights': []}))
-    response.status_code = status_code
+    def render():
+        return {'series': ans.get_tracking(utils.get_series_query(request.args)), 'insights': []}
 
-    return response
+    return responses.get_response(ans.time_tracking, render)
 
 
 @Analysis.route('GET', 'times/preferences/<run_uuid>')
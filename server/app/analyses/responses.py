@@ -0,0 +1,117 @@
+"""
+Rendered analysis responses, kept per series collection version.
+
+A collection's version goes up with every `track`, so between two pushes a poll with the same
+query gets the same bytes. They are rendered once, kept gzipped in each process, up to `SIZE` bytes
+in all, and sent with an ETag, so a client that already has them gets `304 Not Modified`.
+Clients that accept `columns.MIMETYPE` get the series arrays in binary instead of JSON.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+from flask import Response, request, make_response
+
+from app.utils import format_rv, get_rv
+from . import columns
+from .series_collection import SeriesCollection
+
+# bytes
+SIZE = 64 * 1024 * 1024
+# smaller responses are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+
+
+class CachedResponse(NamedTuple):
+    version: int
+    mimetype: str
+    # gzipped, unless it is smaller than `COMPRESS_MIN_SIZE`
+    body: bytes
+    is_compressed: bool
+
+
+_lock = threading.Lock()
+_responses: 'OrderedDict[Tuple[str, str], CachedResponse]' = OrderedDict()
+_total_size = 0
+
+
+def _get_query(mimetype: str) -> str:
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+
+    return f'{query}#{mimetype}'
+
+
+def _get_etag(name: str, version: int, query: str) -> str:
+    return f'{version}-{hashlib.sha1(f"{name}?{query}".encode("utf-8")).hexdigest()[:16]}'
+
+
+def _get(name: str, query: str, version: int) -> Optional[CachedResponse]:
+    with _lock:
+        cached = _responses.get((name, query), None)
+        if cached is None or cached.version != version:
+            return None
+        _responses.move_to_end((name, query))
+
+        return cached
+
+
+def _put(name: str, query: str, cached: CachedResponse) -> None:
+    global _total_size
+
+    if len(cached.body) > SIZE // 16:
+        return
+
+    with _lock:
+        previous = _responses.pop((name, query), None)
+        if previous is not None:
+            _total_size -= len(previous.body)
+        _responses[(name, query)] = cached
+        _total_size += len(cached.body)
+        while _total_size > SIZE:
+            _, removed = _responses.popitem(last=False)
+            _total_size -= len(removed.body)
+
+
+def get_response(collection: SeriesCollection, render: Callable[[], Any]) -> Response:
+    """
+    Response with the data from `render` for `collection`, rendered once per version and query
+    """
+    name = str(collection.key)
+    mimetype = request.accept_mimetypes.best_match(['application/json', columns.MIMETYPE], 'application/json')
+    query = _get_query(mimetype)
+    version = collection.version
+    etag = _get_etag(name, version, query)
+
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        cached = _get(name, query, version)
+        if cached is None:
+            if mimetype == columns.MIMETYPE:
+                body = columns.encode(get_rv(render()))
+            else:
+                body = format_rv(render()).get_data()
+            if len(body) >= COMPRESS_MIN_SIZE:
+                cached = CachedResponse(version, mimetype, gzip.compress(body, compresslevel=5), True)
+            else:
+                cached = CachedResponse(version, mimetype, body, False)
+            _put(name, query, cached)
+
+        if not cached.is_compressed:
+            response = make_response(cached.body)
+        elif 'gzip' in request.accept_encodings:
+            response = make_response(cached.body)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = make_response(gzip.decompress(cached.body))
+        response.mimetype = cached.mimetype
+        response.vary.add('Accept-Encoding')
+        response.vary.add('Accept')
+
+    response.set_etag(etag)
+    # cached by the browser, but checked with the server each time
+    response.cache_control.no_cache = True
+
+    return response
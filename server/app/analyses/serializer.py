@@ -0,0 +1,88 @@
+import pickle
+import struct
+from typing import NamedTuple, Optional, Tuple, List
+
+import numpy as np
+from labml_db.serializer import Serializer
+from labml_db.types import ModelDict
+
+MAGIC = b'LMLA\x01'
+ALIGNMENT = 8
+
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+class ArrayInfo(NamedTuple):
+    dtype: str
+    shape: Tuple[int, ...]
+    offset: int
+
+
+def _pad(length: int) -> int:
+    return -length % ALIGNMENT
+
+
+class ArraySerializer(Serializer):
+    """
+    Stores the NumPy arrays of a model as raw little-endian buffers after a small
+    pickled header. Loaded arrays are read-only views on the stored bytes.
+    Data written by `PickleSerializer` is still readable.
+    """
+
+    file_extension = 'arr'
+    is_bytes = True
+
+    def to_string(self, data: ModelDict) -> bytes:
+        buffers: List[bytes] = []
+        offset = 0
+
+        def extract(value):
+            nonlocal offset
+
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value, dtype=value.dtype.newbyteorder('<'))
+                buffers.append(value.tobytes())
+                info = ArrayInfo(value.dtype.str, value.shape, offset)
+                padding = _pad(value.nbytes)
+                if padding:
+                    buffers.append(b'\0' * padding)
+                offset += value.nbytes + padding
+
+                return info
+            elif isinstance(value, dict):
+                return {k: extract(v) for k, v in value.items()}
+            elif isinstance(value, list):
+                return [extract(v) for v in value]
+            else:
+                return value
+
+        header = pickle.dumps(extract(data), protocol=pickle.HIGHEST_PROTOCOL)
+        start = len(MAGIC) + _HEADER_LENGTH.size + len(header)
+
+        return b''.join([MAGIC, _HEADER_LENGTH.pack(len(header)), header, b'\0' * _pad(start)] + buffers)
+
+    def from_string(self, data: Optional[bytes]) -> Optional[ModelDict]:
+        if data is None:
+            return None
+        if not data.startswith(MAGIC):
+            return pickle.loads(data)
+
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        header_length, = _HEADER_LENGTH.unpack_from(data, len(MAGIC))
+        header = pickle.loads(data[header_start:header_start + header_length])
+        start = header_start + header_length
+        start += _pad(start)
+
+        def restore(value):
+            if isinstance(value, ArrayInfo):
+                dtype = np.dtype(value.dtype)
+                count = int(np.prod(value.shape))
+                return np.frombuffer(data, dtype, count, start + value.offset).reshape(value.shape)
+            elif isinstance(value, dict):
+                return {k: restore(v) for k, v in value.items()}
+            elif isinstance(value, list):
+                return [restore(v) for v in value]
+            else:
+                return value
+
+        return restore(header)
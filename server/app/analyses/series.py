@@ -1,196 +1,731 @@
 import math
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Union, NamedTuple, Tuple
 
 import numpy as np
 
+from . import downsample, smoothing
+from .sketch import QuantileSketch
+from .stats import SeriesStats
+from ..enums import DownsampleEnums, SmoothingEnums
+from .. import settings
+
 MAX_BUFFER_LENGTH = 1024
 SMOOTH_POINTS = 50
 MIN_SMOOTH_POINTS = 1
 OUTLIER_MARGIN = 0.04
+# fewer values are shown in full, without trimming outliers
+MIN_OUTLIER_POINTS = 10
+
+# finer levels kept under the top buffer, each `LOD_FACTOR` times finer than the one above;
+# they hold only the most recent `LOD_LEVEL_LENGTH` buckets so memory stays bounded,
+# and a level is kept only while it is coarser than the raw steps
+LOD_LEVELS = 3
+LOD_FACTOR = 4
+LOD_LEVEL_LENGTH = MAX_BUFFER_LENGTH
+
+STEP_DTYPE = np.float64
+VALUE_DTYPE = np.float32
+COUNT_DTYPE = np.int64
+
+SeriesModel = Dict[str, Union[List[float], np.ndarray, float]]
+
+
+class SeriesQuery(NamedTuple):
+    start_step: Optional[float] = None
+    end_step: Optional[float] = None
+    points: Optional[int] = None
+    method: Optional[str] = None
+    smoothing: Optional[str] = None
+    since_step: Optional[float] = None
+
+
+def _fill_nan(values: np.ndarray, previous: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Replaces non-finite values with the last finite one before them along the last axis,
+    or with `previous` (one per row) if there is none
+    """
+    is_finite = np.isfinite(values)
+    if is_finite.all():
+        return values
+
+    idx = np.where(is_finite, np.arange(values.shape[-1]), -1)
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    filled = np.take_along_axis(values, np.maximum(idx, 0), axis=-1)
+
+    return np.where(idx >= 0, filled, np.asarray(previous)[..., None])
+
+
+def _get_cumsum(values: np.ndarray) -> np.ndarray:
+    cumsum = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+    np.cumsum(values, axis=-1, out=cumsum[..., 1:])
+
+    return cumsum
+
+
+def _box_smooth(cumsum: np.ndarray, span: Union[int, np.ndarray]) -> np.ndarray:
+    """
+    Mean over a window of `span // 2` points on each side, clipped at the ends.
+    `span` can be given per row.
+    """
+    n = cumsum.shape[-1] - 1
+    shape = cumsum.shape[:-1] + (n,)
+    span_extra = np.asarray(span)[..., None] // 2
+    idx = np.arange(n)
+    lo = np.broadcast_to(np.maximum(idx - span_extra, 0), shape)
+    hi = np.broadcast_to(np.minimum(idx + span_extra + 1, n), shape)
 
-SeriesModel = Dict[str, Union[List[float], float]]
+    return (np.take_along_axis(cumsum, hi, axis=-1) - np.take_along_axis(cumsum, lo, axis=-1)) / (hi - lo)
+
+
+def _mean_angle(dx: Optional[np.ndarray], smoothed: np.ndarray, y_range: np.ndarray,
+                aspect_ratio: float) -> np.ndarray:
+    if dx is None:
+        return np.zeros(smoothed.shape[:-1])
+
+    is_flat = y_range < 1e-9
+    dy = np.diff(smoothed, axis=-1) / np.where(is_flat, 1., y_range)[..., None]
+    angle = np.mean(np.arctan2(np.abs(dy) * aspect_ratio, np.abs(dx)), axis=-1)
+
+    return np.where(is_flat, 0., angle)
 
 
 class Series:
-    step: List[float]
-    last_step: List[float]
-    value: List[float]
+    __slots__ = ['step', 'last_step', 'value', 'minimum', 'maximum', 'count', 'step_gap', 'gap_step', 'levels',
+                 'smoothed', 'smooth_span', 'smooth_step', 'sketch', 'stats', 'is_delta']
+
+    step: np.ndarray
+    last_step: np.ndarray
+    value: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    count: np.ndarray
     step_gap: float
+    # last step when the buckets were redrawn with a new `step_gap`
+    gap_step: float
+    levels: List['Series']
+    smoothed: Optional[np.ndarray]
+    smooth_span: Union[int, np.ndarray]
+    # last step when `smooth_span` changed, which changes every smoothed value
+    smooth_step: float
+    sketch: Optional[QuantileSketch]
+    stats: SeriesStats
+    # only the buckets since `SeriesQuery.since_step`
+    is_delta: bool
 
     def __init__(self):
-        self.step = []
-        self.last_step = []
-        self.value = []
+        self.step = np.zeros(0)
+        self.last_step = np.zeros(0)
+        self.value = np.zeros(0)
+        self.minimum = np.zeros(0)
+        self.maximum = np.zeros(0)
+        self.count = np.zeros(0, dtype=COUNT_DTYPE)
         self.step_gap = 0
+        self.gap_step = 0
+        self.levels = []
+        self.smoothed = None
+        self.smooth_span = 0
+        self.smooth_step = 0
+        self.sketch = None
+        self.stats = SeriesStats()
+        self.is_delta = False
 
     @property
     def last_value(self) -> float:
-        return self.value[-1]
+        return self.value[-1].item()
 
     @property
-    def detail(self) -> Dict[str, List[float]]:
+    def detail(self) -> Dict[str, Union[np.ndarray, float, bool]]:
+        """
+        The buckets as arrays; responses turn them into lists, or send them as they are
+        """
         return {
             'step': self.last_step,
             'value': self.value,
-            'smoothed': self.smooth_45(),
-            'mean': np.mean(self.value)
+            'smoothed': self._get_smoothed(),
+            'min': self.minimum,
+            'max': self.maximum,
+            'count': self.count,
+            'mean': self.stats.mean,
+            'is_delta': self.is_delta
         }
 
     @property
-    def summary(self) -> Dict[str, np.ndarray]:
-        return {
-            'mean': np.mean(self.value)
-        }
+    def summary(self) -> Dict[str, float]:
+        return self.stats.summary
+
+    @staticmethod
+    def get_summary(data: SeriesModel) -> Dict[str, float]:
+        """
+        Summary of stored series data, without loading its arrays
+        """
+        if 'stats' in data:
+            return SeriesStats().load(data['stats']).summary
+
+        return Series().load(data).summary
 
     def to_data(self) -> SeriesModel:
-        return {
-            'step': self.step,
-            'value': self.value,
-            'last_step': self.last_step,
+        data = {
+            'step': np.ascontiguousarray(self.step, dtype=STEP_DTYPE),
+            'value': np.ascontiguousarray(self.value, dtype=VALUE_DTYPE),
+            'last_step': np.ascontiguousarray(self.last_step, dtype=STEP_DTYPE),
+            'min': np.ascontiguousarray(self.minimum, dtype=VALUE_DTYPE),
+            'max': np.ascontiguousarray(self.maximum, dtype=VALUE_DTYPE),
+            'count': np.ascontiguousarray(self.count, dtype=COUNT_DTYPE),
             'step_gap': self.step_gap
         }
-
-    def update(self, steps: List[float], values: List[float]) -> None:
-        start_step = len(self.value)
-        self.step += steps.copy()
-        self.value += values.copy()
-        self.last_step += steps.copy()
-        self._remove_nan(start_step)
-
-        self.merge()
-        while len(self) > MAX_BUFFER_LENGTH:
-            self.step_gap *= 2
-            self.merge()
-
-    def _remove_nan(self, start_step):
-        for i in range(start_step, len(self.value)):
-            if not np.isfinite(self.value[i]):
-                self.value[i] = 0 if i == 0 else self.value[i - 1]
+        if self.gap_step:
+            data['gap_step'] = self.gap_step
+        if self.stats.count:
+            data['stats'] = self.stats.to_data()
+        if self.smoothed is not None:
+            data['smoothed'] = np.ascontiguousarray(self.smoothed, dtype=VALUE_DTYPE)
+            data['smooth_span'] = self.smooth_span
+        if self.smooth_step:
+            data['smooth_step'] = self.smooth_step
+        if self.levels:
+            data['levels'] = [level.to_data() for level in self.levels]
+        if self.sketch is not None:
+            data['sketch'] = self.sketch.to_data()
+
+        return data
+
+    def update(self, steps: List[float], values: List[float], lod_levels: int = LOD_LEVELS) -> None:
+        Series.update_many([self], steps, [values], lod_levels)
+
+    @staticmethod
+    def update_many(series: List['Series'], steps: List[float], values: List[List[float]],
+                    lod_levels: int = LOD_LEVELS) -> None:
+        """
+        Same as calling `update` on each of `series` with its row of `values`, in one pass.
+        At most `lod_levels` finer levels are kept.
+        All of them must have the same `get_layout_key`; the buffers are stacked into 2-D arrays,
+        merged and smoothed together, and split back.
+        """
+        steps = np.asarray(steps, dtype=STEP_DTYPE)
+        previous = np.array([s.value[-1] if len(s.value) else 0 for s in series])
+        values = _fill_nan(np.asarray(values, dtype=np.float64), previous)
+
+        for s, v in zip(series, values):
+            s._update_aggregates(v)
+
+        stacked = Series._stack(series)
+        # the buckets before the last one are already apart by `step_gap`
+        start = max(0, len(stacked) - 1)
+        stacked._append(steps, values)
+        stacked.merge(start)
+        stacked._update_levels(steps, values, lod_levels)
+
+        extent = None
+        # with few buckets `get_extent` uses the whole range, with or without a sketch
+        if len(stacked) >= MIN_OUTLIER_POINTS and all(s.sketch is not None for s in series):
+            extent = np.array([s._get_sketch_extent() for s in series]).T
+        stacked.smoothed = stacked.smooth_45(extent)
+
+        for i, s in enumerate(series):
+            smooth_span = s.smooth_span
+            stacked._get_row(i, s)
+            if s.smooth_span != smooth_span:
+                s.smooth_step = s.last_step[-1].item()
+
+    @staticmethod
+    def get_layout_key(data: SeriesModel) -> Tuple:
+        """
+        Stored series with equal keys have the same steps and buckets at every level
+        """
+        key = (data.get('step_gap', 0),)
+        for k in ['step', 'last_step', 'count']:
+            key += (np.asarray(data.get(k, ())).tobytes(),)
+        for level in data.get('levels', []):
+            key += Series.get_layout_key(level)
+
+        return key
+
+    @staticmethod
+    def _stack(series: List['Series']) -> 'Series':
+        first = series[0]
+        res = Series()
+        res.step = first.step
+        res.last_step = first.last_step
+        res.count = first.count
+        res.step_gap = first.step_gap
+        res.gap_step = first.gap_step
+        res.value = np.stack([s.value for s in series])
+        res.minimum = np.stack([s.minimum for s in series])
+        res.maximum = np.stack([s.maximum for s in series])
+        res.levels = [Series._stack(levels) for levels in zip(*[s.levels for s in series])]
+
+        return res
+
+    def _get_row(self, i: int, res: 'Series') -> 'Series':
+        res.step = self.step
+        res.last_step = self.last_step
+        res.count = self.count
+        res.step_gap = self.step_gap
+        res.gap_step = self.gap_step
+        res.value = self.value[i]
+        res.minimum = self.minimum[i]
+        res.maximum = self.maximum[i]
+        res.smoothed = None
+        if self.smoothed is not None:
+            res.smoothed = self.smoothed[i]
+            res.smooth_span = int(self.smooth_span[i])
+        res.levels = [level._get_row(i, Series()) for level in self.levels]
+
+        return res
+
+    @staticmethod
+    def mean(series: List['Series']) -> 'Series':
+        """
+        Mean of the full buffers of `series`, at the buckets they all have
+        """
+        last_step = series[0].last_step
+        for s in series[1:]:
+            last_step = np.intersect1d(last_step, s.last_step, assume_unique=True)
+        aligned = [s._at(np.searchsorted(s.last_step, last_step)) for s in series]
+
+        res = Series()
+        res.last_step = last_step
+        res.step = aligned[0].step
+        res.value = np.mean([s.value for s in aligned], axis=0)
+        res.minimum = np.mean([s.minimum for s in aligned], axis=0)
+        res.maximum = np.mean([s.maximum for s in aligned], axis=0)
+        res.count = aligned[0].count
+        res.smoothed = np.mean([s.smoothed for s in aligned], axis=0)
+        res.step_gap = max(s.step_gap for s in series)
+        res.gap_step = max(s.gap_step for s in series)
+        res.smooth_span = max(int(np.max(s.smooth_span)) for s in series)
+        res.smooth_step = max(s.smooth_step for s in series)
+
+        return res
+
+    def _at(self, idx: np.ndarray) -> 'Series':
+        res = Series()
+        res.step = self.step
+        res.last_step = self.last_step
+        res.value = self.value
+        res.minimum = self.minimum
+        res.maximum = self.maximum
+        res.count = self.count
+        res.smoothed = self._get_smoothed()
+        res._index(idx)
+
+        return res
+
+    def _update_aggregates(self, values: np.ndarray) -> None:
+        # with the sketch, outliers are trimmed from the extent using every value ever added,
+        # instead of the values in the merged buffer
+        if settings.IS_QUANTILE_SKETCH:
+            if self.sketch is None:
+                self.sketch = QuantileSketch()
+                self.sketch.update(self.value)
+            self.sketch.update(values)
+        self.stats.update(values)
+
+    def _append(self, steps: np.ndarray, values: np.ndarray) -> None:
+        self.step = np.concatenate((self.step, steps))
+        self.last_step = np.concatenate((self.last_step, steps))
+        self.value = np.concatenate((self.value, values), axis=-1)
+        self.minimum = np.concatenate((self.minimum, values), axis=-1)
+        self.maximum = np.concatenate((self.maximum, values), axis=-1)
+        self.count = np.concatenate((self.count, np.ones(len(steps), dtype=COUNT_DTYPE)))
+
+    def _update_levels(self, steps: np.ndarray, values: np.ndarray, lod_levels: int) -> None:
+        # a level is finer than the raw steps, and only copies them,
+        # unless the top buckets hold more than `LOD_FACTOR ** (i + 1)` points
+        max_count = self.count.max() if len(self.count) else 0
+        n_levels = 0
+        while n_levels < lod_levels and LOD_FACTOR ** (n_levels + 1) < max_count:
+            n_levels += 1
+
+        self.levels = self.levels[:n_levels]
+        while len(self.levels) < n_levels:
+            level = Series()
+            level.value = level.minimum = level.maximum = np.zeros(values.shape[:-1] + (0,))
+            self.levels.append(level)
+
+        for i, level in enumerate(self.levels):
+            level._append(steps, values)
+            level.step_gap = self.step_gap / LOD_FACTOR ** (i + 1)
+            if level.step_gap and len(level) > 1:
+                level._merge_cells(level._get_cells(), level.last_step[0] - level.step_gap)
+            level._trim(LOD_LEVEL_LENGTH)
+
+    def _trim(self, length: int) -> None:
+        if len(self) > length:
+            self._index(slice(-length, None))
+
+    def _index(self, idx: Union[slice, np.ndarray]) -> None:
+        self.step = self.step[idx]
+        self.last_step = self.last_step[idx]
+        self.value = self.value[..., idx]
+        self.minimum = self.minimum[..., idx]
+        self.maximum = self.maximum[..., idx]
+        self.count = self.count[idx]
+        if self.smoothed is not None:
+            self.smoothed = self.smoothed[..., idx]
 
     def _find_gap(self) -> None:
         if self.step_gap:
             return
         assert len(self) > 1
 
-        last_step = np.array(self.last_step)
-        gap = last_step[1:] - last_step[:-1]
+        gap = self.last_step[1:] - self.last_step[:-1]
         self.step_gap = gap.max().item()
+        if self.step_gap <= 0:
+            self.step_gap = 1
+
+    def _get_cells(self) -> np.ndarray:
+        cells = np.floor(self.last_step / self.step_gap).astype(np.int64)
+        # a step going backwards is merged into the current bucket
+        np.maximum.accumulate(cells, out=cells)
+
+        return cells
+
+    def _get_runs(self, start: int) -> np.ndarray:
+        """
+        Bucket of each point, grouping the points from `start` on into runs that end
+        less than `step_gap` after the end of the previous run
+        """
+        last_step = np.maximum.accumulate(self.last_step)
+        cells = np.arange(len(last_step))
+        previous = last_step[start - 1] if start > 0 else 0.
+        i = start
+        while i < len(last_step):
+            end = max(i + 1, np.searchsorted(last_step, previous + self.step_gap, 'left'))
+            cells[i:end] = i
+            previous = last_step[end - 1]
+            i = end
+
+        return cells
+
+    def merge(self, start: int = 0) -> None:
+        """
+        Merges the points from `start` on, and all of them again with a doubled `step_gap`
+        while there are more than `MAX_BUFFER_LENGTH` buckets
+        """
+        if len(self) <= 1:
+            return
+
+        if not self.step_gap:
+            self._find_gap()
+            self.gap_step = self.last_step[-1].item()
 
-    def merge(self) -> None:
-        if len(self) == 1:
+        self._merge_cells(self._get_runs(start), 0.)
+        while len(self) > MAX_BUFFER_LENGTH:
+            self.step_gap *= 2
+            self.gap_step = self.last_step[-1].item()
+            self._merge_cells(self._get_runs(0), 0.)
+
+    def _merge_cells(self, cells: np.ndarray, first_step: float) -> None:
+        is_start = np.empty(len(cells), dtype=bool)
+        is_start[0] = True
+        np.not_equal(cells[1:], cells[:-1], out=is_start[1:])
+        if is_start.all():
             return
 
-        self._find_gap()
-
-        i = 0
-        j = 1
-        last_step = 0
-        while j < len(self):
-            if self.last_step[j] - last_step < self.step_gap:
-                # merge
-                iw = max(1., self.last_step[i] - last_step)
-                jw = max(1., self.last_step[j] - self.last_step[i])
-                self.step[i] = (self.step[i] * iw + self.step[j] * jw) / (iw + jw)
-                self.value[i] = (self.value[i] * iw + self.value[j] * jw) / (iw + jw)
-                self.last_step[i] = self.last_step[j]
-                j += 1
-            else:
-                last_step = self.last_step[i]
-                i += 1
-                self.last_step[i] = self.last_step[j]
-                self.step[i] = self.step[j]
-                self.value[i] = self.value[j]
-                j += 1
-
-        i += 1
-        self.last_step = self.last_step[:i]
-        self.step = self.step[:i]
-        self.value = self.value[:i]
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], len(cells)) - 1
+
+        weights = np.diff(self.last_step, prepend=first_step)
+        np.maximum(weights, 1., out=weights)
+        total = np.add.reduceat(weights, starts)
+
+        self.step = np.add.reduceat(self.step * weights, starts) / total
+        self.value = np.add.reduceat(self.value * weights, starts, axis=-1) / total
+        self.last_step = self.last_step[ends]
+        self.minimum = np.minimum.reduceat(self.minimum, starts, axis=-1)
+        self.maximum = np.maximum.reduceat(self.maximum, starts, axis=-1)
+        self.count = np.add.reduceat(self.count, starts)
+        if self.smoothed is not None:
+            self.smoothed = np.add.reduceat(self.smoothed * weights, starts, axis=-1) / total
 
     def __len__(self):
         return len(self.last_step)
 
+    def _covers(self, top: 'Series', start_step: Optional[float]) -> bool:
+        if len(self) == 0:
+            return False
+        if self.last_step[0] <= top.last_step[0]:
+            return True
+
+        return start_step is not None and start_step >= self.last_step[0]
+
+    def _get_range(self, start_step: Optional[float], end_step: Optional[float]) -> slice:
+        start = 0
+        end = len(self)
+        if start_step is not None:
+            start = np.searchsorted(self.last_step, start_step, 'left')
+        if end_step is not None:
+            end = np.searchsorted(self.last_step, end_step, 'left') + 1
+
+        return slice(start, end)
+
+    def select(self, query: Optional[SeriesQuery]) -> 'Series':
+        """
+        Picks the coarsest level that has at least `query.points` buckets in the step range,
+        or the finest level that still covers the range, and slices it to the range.
+        With `query.method` set, the result is further downsampled to `query.points`.
+        With `query.smoothing` set, the line is smoothed with that kernel instead of the default box filter.
+        `query.since_step` is used only when no other field is set; otherwise it is ignored
+        and the whole selection is returned, with `is_delta` unset.
+        """
+        if query is None or query == SeriesQuery():
+            return self
+
+        if query._replace(since_step=None) == SeriesQuery():
+            return self._get_delta(query.since_step)
+
+        selected = self
+        if query.points is not None:
+            for level in self.levels:
+                if len(selected.last_step[selected._get_range(query.start_step, query.end_step)]) >= query.points:
+                    break
+                if not level._covers(self, query.start_step):
+                    break
+                selected = level
+
+        res = Series()
+        res.step = selected.step
+        res.last_step = selected.last_step
+        res.value = selected.value
+        res.minimum = selected.minimum
+        res.maximum = selected.maximum
+        res.count = selected.count
+        res.step_gap = selected.step_gap
+        res.smoothed = selected.smoothed
+        res.smooth_span = selected.smooth_span
+        res.stats = self.stats
+        res._index(selected._get_range(query.start_step, query.end_step))
+
+        if query.smoothing is not None:
+            res._smooth(query.smoothing, self.get_smooth_width())
+
+        if query.points is not None and query.method is not None and len(res) > query.points:
+            res._downsample(query.method, query.points)
+
+        return res
+
+    def _get_delta(self, since_step: float) -> 'Series':
+        """
+        The buckets from the one that ended at `since_step`, which may have grown since,
+        and enough before it to cover the smoothing window that reaches into the new ones.
+        All of them if the buckets were redrawn, or the smoothing span changed, after `since_step`.
+        """
+        if since_step < max(self.gap_step, self.smooth_step):
+            return self
+
+        smoothed = self._get_smoothed()
+        idx = np.searchsorted(self.last_step, since_step, 'left')
+        # clients replace their buckets from the first step sent, so it starts before `since_step`,
+        # in case the bucket that ended there has grown past it
+        start = idx - int(self.smooth_span) // 2 - 1
+        if start < 0:
+            return self
+
+        res = Series()
+        res.step = self.step[start:]
+        res.last_step = self.last_step[start:]
+        res.value = self.value[start:]
+        res.minimum = self.minimum[start:]
+        res.maximum = self.maximum[start:]
+        res.count = self.count[start:]
+        res.step_gap = self.step_gap
+        res.smoothed = smoothed[start:]
+        res.smooth_span = self.smooth_span
+        res.stats = self.stats
+        res.is_delta = True
+
+        return res
+
+    def _downsample(self, method: str, points: int) -> None:
+        if method == DownsampleEnums.MEAN:
+            idx = None
+        elif method == DownsampleEnums.MIN_MAX:
+            idx = downsample.min_max(self.value, points)
+        elif method == DownsampleEnums.LTTB:
+            idx = downsample.lttb(self.last_step, self.value, points)
+        else:
+            return
+
+        # smooth at full resolution, before points are dropped
+        self._get_smoothed()
+
+        if idx is None:
+            self._merge_cells(downsample.get_buckets(len(self), points), self.last_step[0] - self.step_gap)
+        else:
+            # each kept point carries the envelope up to the next kept point
+            starts = idx.copy()
+            starts[0] = 0
+            minimum = np.minimum.reduceat(self.minimum, starts, axis=-1)
+            maximum = np.maximum.reduceat(self.maximum, starts, axis=-1)
+            count = np.add.reduceat(self.count, starts)
+
+            self._index(idx)
+            self.minimum = minimum
+            self.maximum = maximum
+            self.count = count
+
+    def get_smooth_width(self) -> float:
+        """
+        The automatically chosen smoothing span, in steps
+        """
+        if len(self) < 2:
+            return 0
+
+        self._get_smoothed()
+
+        return self.smooth_span * (self.last_step[-1] - self.last_step[0]) / (len(self) - 1)
+
+    def _smooth(self, kernel: str, width: float) -> None:
+        """
+        Kernels are scaled to the same variance as a box filter of `width` steps
+        """
+        if kernel == SmoothingEnums.BOX:
+            self.smoothed = smoothing.box(self.last_step, self.value, width)
+        elif kernel == SmoothingEnums.EMA:
+            self.smoothed = smoothing.ema(self.last_step, self.value, width / math.sqrt(12))
+        elif kernel == SmoothingEnums.GAUSSIAN:
+            self.smoothed = smoothing.gaussian(self.last_step, self.value, width / math.sqrt(12))
+
     def get_extent(self, is_remove_outliers: bool):
-        if len(self.value) == 0:
+        """
+        Extent of the values along the last axis, so stacked series get one per row
+        """
+        n = self.value.shape[-1]
+        if n == 0:
             return [0, 0]
-        elif len(self.value) < 10:
-            return [min(self.value), max(self.value)]
+        elif n < MIN_OUTLIER_POINTS:
+            return [self.value.min(axis=-1), self.value.max(axis=-1)]
         elif not is_remove_outliers:
-            return [min(self.value), max(self.value)]
-
-        values = np.sort(self.value)
-        margin = int(len(values) * OUTLIER_MARGIN)
-        std_dev = np.std(self.value[margin:-margin])
-        start = 0
-        while start < margin:
-            if values[start] + std_dev * 2 > values[margin]:
-                break
-            start += 1
-        end = len(values) - 1
-        while end > len(values) - margin - 1:
-            if values[end] - std_dev * 2 < values[-margin]:
-                break
-            end -= 1
-
-        return [values[start], values[end]]
-
-    def smooth_45(self) -> List[float]:
+            return [self.value.min(axis=-1), self.value.max(axis=-1)]
+        elif self.sketch is not None:
+            return self._get_sketch_extent()
+
+        margin = int(n * OUTLIER_MARGIN)
+        if margin == 0:
+            return [self.value.min(axis=-1), self.value.max(axis=-1)]
+
+        # only the `margin + 1` smallest and largest values need to be in order
+        values = np.partition(self.value, (margin, n - margin - 1), axis=-1)
+        low = np.sort(values[..., :margin + 1], axis=-1)
+        high = np.sort(values[..., n - margin - 1:], axis=-1)
+        std_dev = np.std(self.value[..., margin:-margin], axis=-1)[..., None]
+
+        # smallest value within two deviations of the trimmed minimum;
+        # the values that are, are the last ones of `low[:margin]`
+        is_inside = low[..., :margin] + std_dev * 2 > low[..., margin:margin + 1]
+        start = margin - np.count_nonzero(is_inside, axis=-1)
+        # largest value within two deviations of the trimmed maximum;
+        # the values that are, are the first ones of `high[1:]`
+        is_inside = high[..., 1:] - std_dev * 2 < high[..., 1:2]
+        end = np.count_nonzero(is_inside, axis=-1)
+
+        return [np.take_along_axis(low, start[..., None], axis=-1)[..., 0],
+                np.take_along_axis(high, end[..., None], axis=-1)[..., 0]]
+
+    def _get_sketch_extent(self):
+        """
+        The same outlier rule, applied to the sketch of all values ever added
+        """
+        values, weights = self.sketch.get_sorted()
+        low, high = self.sketch.quantile([OUTLIER_MARGIN, 1 - OUTLIER_MARGIN])
+
+        is_trimmed = (values >= low) & (values <= high)
+        mean = np.average(values[is_trimmed], weights=weights[is_trimmed])
+        std_dev = np.sqrt(np.average((values[is_trimmed] - mean) ** 2, weights=weights[is_trimmed]))
+
+        # as in `get_extent`, the trimmed minimum and maximum are the limits when nothing is within
+        # two deviations of them, which happens when all the values are equal
+        start = min(values[min(np.searchsorted(values, low - std_dev * 2, side='right'), len(values) - 1)], low)
+        end = max(values[max(np.searchsorted(values, high + std_dev * 2, side='left') - 1, 0)], high)
+
+        return [start, end]
+
+    def smooth_45(self, extent: Optional[List[np.ndarray]] = None) -> np.ndarray:
+        """
+        Box smoothing with the smallest span that brings the mean slope of the line,
+        drawn at an aspect ratio of 0.5, under 45 degrees.
+        Stacked series are searched together, each row for its own span.
+        """
         forty_five = math.pi / 4
-        hi = max(1, len(self.value) // MIN_SMOOTH_POINTS)
-        lo = 1
+        shape = self.value.shape[:-1]
+        hi = np.full(shape, max(1, len(self) // MIN_SMOOTH_POINTS))
+        lo = np.ones(shape, dtype=hi.dtype)
+
+        cumsum = _get_cumsum(self.value)
+        dx, y_range = self._get_angle_scale(extent)
 
-        while lo < hi:
+        while np.any(lo < hi):
             m = (lo + hi) // 2
-            smoothed = self.smooth_value(m)
-            angle = self.mean_angle(smoothed, 0.5)
-            if angle > forty_five:
-                lo = m + 1
-            else:
-                hi = m
+            is_searching = lo < hi
+            is_steep = _mean_angle(dx, _box_smooth(cumsum, m), y_range, 0.5) > forty_five
+            lo = np.where(is_searching & is_steep, m + 1, lo)
+            hi = np.where(is_searching & ~is_steep, m, hi)
 
-        return self.smooth_value(hi)
+        self.smooth_span = hi if hi.ndim else int(hi)
 
-    def mean_angle(self, smoothed: List[float], aspect_ratio: float) -> Union[np.ndarray, float]:
-        x_range = max(self.last_step) - min(self.last_step)
-        y_extent = self.get_extent(True)
-        y_range = y_extent[1] - y_extent[0]
+        return _box_smooth(cumsum, hi)
 
-        if x_range < 1e-9 or y_range < 1e-9:
-            return 0
+    def _get_angle_scale(self, extent: Optional[List[np.ndarray]] = None) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        if len(self) == 0:
+            return None, np.zeros(0)
+
+        x_range = self.last_step[-1] - self.last_step[0]
+        if x_range < 1e-9:
+            return None, np.zeros(0)
+
+        if extent is None:
+            extent = self.get_extent(True)
+        y_range = np.asarray(extent[1], dtype=np.float64) - extent[0]
 
-        angles = []
-        for i in range(len(smoothed) - 1):
-            dx = (self.last_step[i + 1] - self.last_step[i]) / x_range
-            dy = (smoothed[i + 1] - smoothed[i]) / y_range
-            angles.append(math.atan2(abs(dy) * aspect_ratio, abs(dx)))
+        return np.diff(self.last_step) / x_range, y_range
 
-        return np.mean(angles)
+    def mean_angle(self, smoothed: np.ndarray, aspect_ratio: float) -> float:
+        dx, y_range = self._get_angle_scale()
 
-    def smooth_value(self, span: Optional[int] = None) -> List[float]:
+        return float(_mean_angle(dx, smoothed, y_range, aspect_ratio))
+
+    def smooth_value(self, span: Optional[int] = None) -> np.ndarray:
         if span is None:
-            span = len(self.value) // SMOOTH_POINTS
-        span_extra = span // 2
-
-        n = 0
-        total = 0
-        smoothed = []
-        for i in range(len(self.value) + span_extra):
-            j = i - span_extra
-            if i < len(self.value):
-                total += self.value[i]
-                n += 1
-            if j - span_extra - 1 >= 0:
-                total -= self.value[j - span_extra - 1]
-                n -= 1
-            if j >= 0:
-                smoothed.append(total / n)
-
-        return smoothed
+            span = len(self) // SMOOTH_POINTS
+
+        return _box_smooth(_get_cumsum(self.value), span)
+
+    def _get_smoothed(self) -> np.ndarray:
+        if self.smoothed is None:
+            self.smoothed = self.smooth_45()
+
+        return self.smoothed
 
     def load(self, data):
-        self.step = data['step'].copy()
-        self.last_step = data['last_step'].copy()
-        self.value = data['value'].copy()
-        self._remove_nan(0)
+        self._load_buffer(data)
+        self.levels = [Series()._load_buffer(level) for level in data.get('levels', [])]
+        if 'smoothed' in data:
+            self.smoothed = np.asarray(data['smoothed'])
+            self.smooth_span = data['smooth_span']
+            self.smooth_step = data.get('smooth_step', 0)
+        if 'sketch' in data:
+            self.sketch = QuantileSketch().load(data['sketch'])
+        if 'stats' in data:
+            self.stats = SeriesStats().load(data['stats'])
+        elif len(self.value):
+            # series stored before the aggregates were kept; start from the merged buffer
+            self.stats.update(self.value, self.count)
+            self.stats.minimum = float(np.min(self.minimum))
+            self.stats.maximum = float(np.max(self.maximum))
+
+        return self
+
+    def _load_buffer(self, data):
+        # stored arrays are used as they are, read-only; updates allocate new ones
+        self.step = np.asarray(data['step'], dtype=STEP_DTYPE)
+        self.last_step = np.asarray(data['last_step'], dtype=STEP_DTYPE)
+        self.value = _fill_nan(np.asarray(data['value']), 0)
+        # series saved before envelopes were kept have one point per bucket
+        self.minimum = np.asarray(data.get('min', self.value))
+        self.maximum = np.asarray(data.get('max', self.value))
+        self.count = np.asarray(data.get('count', np.ones(len(self.value), dtype=COUNT_DTYPE)))
+        self.step_gap = data.get('step_gap', 0)
+        self.gap_step = data.get('gap_step', 0)
 
         return self
@@ -1,20 +1,28 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List, Tuple
 
-from ..analyses.series import SeriesModel, Series
+import numpy as np
+
+from ..analyses.series import SeriesModel, Series, SeriesQuery, STEP_DTYPE
 from ..enums import SeriesEnums
 
 
 class SeriesCollection:
     tracking: Dict[str, SeriesModel]
     step: int
+    # bumped by each `track`, so responses rendered from the collection can be kept until it changes
+    version: int
+
+    # finer levels kept for each series; only collections that are zoomed into need them
+    lod_levels = 0
 
     @classmethod
     def defaults(cls):
         return dict(tracking={},
                     step=0,
+                    version=0,
                     )
 
-    def get_tracks(self):
+    def get_tracks(self, query: Optional[SeriesQuery] = None):
         res = []
         for ind, track in self.tracking.items():
             name = ind.split('.')
@@ -24,7 +32,7 @@ class SeriesCollection:
                 name = name[:-1]
             name = name[1:]
 
-            series: Dict[str, Any] = Series().load(track).detail
+            series: Dict[str, Any] = Series().load(track).select(query).detail
             series['name'] = '.'.join(name)
 
             res.append(series)
@@ -38,7 +46,7 @@ class SeriesCollection:
             ind = name_split[-1]
             name = '.'.join(name_split[1:-1])
 
-            series: Dict[str, Any] = Series().load(track).summary
+            series: Dict[str, Any] = Series.get_summary(track)
 
             if name in data:
                 data[name][ind] = series['mean']
@@ -52,20 +60,29 @@ class SeriesCollection:
         return sorted_res
 
     def track(self, data: Dict[str, SeriesModel]) -> None:
+        # series pushed with the same steps onto the same history are updated together
+        groups: Dict[Tuple, List[str]] = {}
         for ind, series in data.items():
             self.step = max(self.step, series['step'][-1])
-            self._update_series(ind, series)
+            if ind not in self.tracking:
+                self.tracking[ind] = Series().to_data()
 
-        self.save()
+            key = (np.asarray(series['step'], dtype=STEP_DTYPE).tobytes(),
+                   Series.get_layout_key(self.tracking[ind]))
+            groups.setdefault(key, []).append(ind)
 
-    def _update_series(self, ind: str, series: SeriesModel) -> None:
-        if ind not in self.tracking:
-            self.tracking[ind] = Series().to_data()
+        for inds in groups.values():
+            self._update_series(inds, data)
+
+        self.version += 1
+        self.save()
 
-        s = Series().load(self.tracking[ind])
-        s.update(series['step'], series['value'])
+    def _update_series(self, inds: List[str], data: Dict[str, SeriesModel]) -> None:
+        series = [Series().load(self.tracking[ind]) for ind in inds]
+        Series.update_many(series, data[inds[0]]['step'], [data[ind]['value'] for ind in inds], self.lod_levels)
 
-        self.tracking[ind] = s.to_data()
+        for ind, s in zip(inds, series):
+            self.tracking[ind] = s.to_data()
 
 
 
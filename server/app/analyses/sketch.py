@@ -0,0 +1,94 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# items kept per level; the rank error is about `1 / SKETCH_CAPACITY` of the count
+SKETCH_CAPACITY = 256
+
+
+class QuantileSketch:
+    """
+    A deterministic KLL-style quantile sketch.
+
+    Level `h` holds sorted items that each stand for `2 ** h` values. A level that grows past
+    `SKETCH_CAPACITY` is compacted: every other item is promoted to the next level,
+    starting alternately from the first and the second so that the errors cancel out.
+    Values are added in batches, so the cost is a few sorts of `SKETCH_CAPACITY` items per update.
+    """
+    __slots__ = ['levels', 'parity', 'count']
+
+    levels: List[np.ndarray]
+    parity: np.ndarray
+    count: int
+
+    def __init__(self):
+        self.levels = []
+        self.parity = np.zeros(0, dtype=np.int8)
+        self.count = 0
+
+    def update(self, values: np.ndarray) -> None:
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self._add(0, values)
+
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > SKETCH_CAPACITY:
+                self._compact(h)
+            h += 1
+
+    def _add(self, h: int, values: np.ndarray) -> None:
+        if h == len(self.levels):
+            self.levels.append(np.zeros(0))
+            self.parity = np.append(self.parity, np.int8(0))
+
+        self.levels[h] = np.sort(np.concatenate((self.levels[h], values)))
+
+    def _compact(self, h: int) -> None:
+        items = self.levels[h]
+        # an odd item out stays behind, so the total weight is kept
+        keep = len(items) % 2
+        promoted = items[keep:][self.parity[h]::2]
+        self.parity[h] ^= 1
+        self.levels[h] = items[:keep]
+        self._add(h + 1, promoted)
+
+    def get_sorted(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        All items, sorted, with the number of values each stands for
+        """
+        if not self.levels:
+            return np.zeros(0), np.zeros(0)
+
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** h, dtype=np.float64) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+
+        return values[order], weights[order]
+
+    def quantile(self, q) -> np.ndarray:
+        values, weights = self.get_sorted()
+        if len(values) == 0:
+            return np.zeros(np.shape(q))
+
+        cdf = np.cumsum(weights)
+        idx = np.searchsorted(cdf, np.asarray(q) * cdf[-1], side='left')
+
+        return values[np.minimum(idx, len(values) - 1)]
+
+    def to_data(self):
+        return {
+            'levels': [np.ascontiguousarray(items) for items in self.levels],
+            'parity': np.ascontiguousarray(self.parity),
+            'count': self.count,
+        }
+
+    def load(self, data):
+        self.levels = [np.asarray(items) for items in data['levels']]
+        self.parity = np.array(data['parity'], dtype=np.int8)
+        self.count = data['count']
+
+        return self
@@ -0,0 +1,73 @@
+from typing import Tuple
+
+import numpy as np
+
+# `exp` of larger values overflows float64; the EMA is evaluated in blocks spanning at most this many time constants
+MAX_EXPONENT = 500.
+
+
+def get_window(x: np.ndarray, width: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Index range `[lo, hi)` of the points within `width / 2` steps of each point
+    """
+    lo = np.searchsorted(x, x - width / 2, side='left')
+    hi = np.searchsorted(x, x + width / 2, side='right')
+
+    return lo, hi
+
+
+def box(x: np.ndarray, y: np.ndarray, width: float) -> np.ndarray:
+    """
+    Mean of the points within a window of `width` steps centred on each point
+    """
+    if width <= 0 or len(y) == 0:
+        return y.astype(np.float64)
+
+    cumsum = np.zeros(len(y) + 1)
+    np.cumsum(y, out=cumsum[1:])
+    lo, hi = get_window(x, width)
+
+    return (cumsum[hi] - cumsum[lo]) / (hi - lo)
+
+
+def gaussian(x: np.ndarray, y: np.ndarray, sigma: float) -> np.ndarray:
+    """
+    Three passes of a box filter, which approximates a Gaussian with standard deviation `sigma`
+    """
+    width = 2 * sigma
+    for _ in range(3):
+        y = box(x, y, width)
+
+    return y
+
+
+def ema(x: np.ndarray, y: np.ndarray, tau: float) -> np.ndarray:
+    """
+    Exponential moving average with a time constant of `tau` steps.
+
+    A point `dx` steps after the previous one decays the average by `exp(-dx / tau)`,
+    so uneven spacing is weighted by the steps it covers.
+    The recurrence is unrolled with cumulative sums, scaled by the growth since the start of each block.
+    """
+    y = y.astype(np.float64)
+    if tau <= 0 or len(y) == 0:
+        return y
+
+    # a gap of `MAX_EXPONENT` time constants already forgets the past entirely
+    dt = np.minimum(np.diff(x, prepend=x[0]) / tau, MAX_EXPONENT)
+    alpha = -np.expm1(-dt)
+    t = np.cumsum(dt)
+
+    res = np.empty_like(y)
+    prev = y[0]
+    ref = 0
+    start = 0
+    while start < len(y):
+        end = max(start + 1, int(np.searchsorted(t, t[ref] + MAX_EXPONENT, side='right')))
+        growth = np.exp(t[start:end] - t[ref])
+        res[start:end] = (prev + np.cumsum(alpha[start:end] * y[start:end] * growth)) / growth
+        prev = res[end - 1]
+        ref = end - 1
+        start = end
+
+    return res
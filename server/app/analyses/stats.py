@@ -0,0 +1,92 @@
+import math
+from typing import Dict
+
+import numpy as np
+
+
+class SeriesStats:
+    """
+    Aggregates over every value ever added to a series.
+
+    Batches are combined with the parallel form of Welford's algorithm,
+    so the variance stays accurate over long runs.
+    """
+    __slots__ = ['count', 'total', 'mean', 'm2', 'minimum', 'maximum', 'last']
+
+    count: int
+    total: float
+    mean: float
+    m2: float
+    minimum: float
+    maximum: float
+    last: float
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.mean = 0.
+        self.m2 = 0.
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.last = 0.
+
+    @property
+    def variance(self) -> float:
+        if self.count == 0:
+            return 0.
+
+        return self.m2 / self.count
+
+    @property
+    def summary(self) -> Dict[str, float]:
+        return {
+            'mean': self.mean
+        }
+
+    def update(self, values: np.ndarray, counts: np.ndarray = None) -> None:
+        """
+        Adds `values`; with `counts`, each value stands for the mean of that many values
+        """
+        if len(values) == 0:
+            return
+
+        if counts is None:
+            n = len(values)
+            mean = float(np.mean(values))
+            m2 = float(np.sum(np.square(values - mean)))
+        else:
+            n = int(np.sum(counts))
+            mean = float(np.sum(values * counts) / n)
+            m2 = float(np.sum(counts * np.square(values - mean)))
+
+        count = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / count
+        self.m2 += m2 + delta * delta * self.count * n / count
+        self.count = count
+        self.total += mean * n
+        self.minimum = min(self.minimum, float(np.min(values)))
+        self.maximum = max(self.maximum, float(np.max(values)))
+        self.last = float(values[-1])
+
+    def to_data(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'm2': self.m2,
+            'min': self.minimum,
+            'max': self.maximum,
+            'last': self.last,
+        }
+
+    def load(self, data):
+        self.count = data['count']
+        self.total = data['total']
+        self.mean = data['mean']
+        self.m2 = data['m2']
+        self.minimum = data['min']
+        self.maximum = data['max']
+        self.last = data['last']
+
+        return self
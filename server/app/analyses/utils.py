@@ -1,5 +1,17 @@
 from typing import List, Dict, Any
 
+from flask import abort, make_response
+from werkzeug.datastructures import MultiDict
+
+from app.enums import DownsampleEnums, SmoothingEnums
+from app.utils import format_rv
+from .series import SeriesQuery
+
+# fewer points cannot be downsampled to; the first and last are always kept
+MIN_POINTS = 3
+METHODS = [DownsampleEnums.LTTB, DownsampleEnums.MIN_MAX, DownsampleEnums.MEAN]
+SMOOTHINGS = [SmoothingEnums.BOX, SmoothingEnums.EMA, SmoothingEnums.GAUSSIAN]
+
 
 def find_common_prefix(names: List[str]):
     shortest = min(names, key=len)
@@ -31,3 +43,30 @@ def remove_common_prefix(series: List[Dict[str, Any]], key: str):
         name = s[key][len_removed:]
 
         s[key] = '.'.join(name)
+
+
+def _abort_invalid(error: str, message: str):
+    response = make_response(format_rv({'error': error, 'message': message}))
+    response.status_code = 400
+    abort(response)
+
+
+def get_series_query(args: MultiDict) -> SeriesQuery:
+    points = args.get('points', None, type=int)
+    if points is not None and points < MIN_POINTS:
+        _abort_invalid('invalid_points', f'points should be at least {MIN_POINTS}')
+
+    method = args.get('method', None)
+    if method is not None and method not in METHODS:
+        _abort_invalid('invalid_method', f'method should be one of {", ".join(METHODS)}')
+
+    smoothing = args.get('smoothing', None)
+    if smoothing is not None and smoothing not in SMOOTHINGS:
+        _abort_invalid('invalid_smoothing', f'smoothing should be one of {", ".join(SMOOTHINGS)}')
+
+    return SeriesQuery(start_step=args.get('start_step', None, type=float),
+                       end_step=args.get('end_step', None, type=float),
+                       points=points,
+                       method=method,
+                       smoothing=smoothing,
+                       since_step=args.get('since_step', None, type=float))
@@ -8,6 +8,7 @@ from flask import request, make_response
 from ..db import session
 from ..db import project
 from ..db import user
+from ..db import identity_map
 
 request = typing.cast(werkzeug.wrappers.Request, request)
 
@@ -58,7 +59,7 @@ def get_auth_user() -> Optional[user.User]:
 
     u = None
     if s.user:
-        u = s.user.load()
+        u = identity_map.load(s.user)
 
     return u
 
@@ -3,9 +3,7 @@ from importlib import import_module
 
 import redis
 from labml_db import Model, Index
-from labml_db.driver.redis import RedisDbDriver
 from labml_db.driver.file import FileDbDriver
-from labml_db.index_driver.redis import RedisIndexDbDriver
 from labml_db.index_driver.file import FileIndexDbDriver
 from labml_db.serializer.json import JsonSerializer
 from labml_db.serializer.yaml import YamlSerializer
@@ -16,11 +14,20 @@ from .user import User, UserIndex
 from .status import Status, RunStatus
 from .session import Session, SessionIndex
 from .run import Run, RunIndex
+from .run_summary import RunSummary
 from .computer import Computer, ComputerIndex
 from ..analyses import AnalysisManager
+from ..analyses.serializer import ArraySerializer
+from .unit_of_work import BufferedRedisDbDriver, BufferedRedisIndexDbDriver
+from .redis_hash import RedisHashDbDriver
+from .array_file import ArrayFileDbDriver
+from .tracking import ChangeTracking
+from . import output
+from . import listing
 
 Models = [(YamlSerializer(), User), (YamlSerializer(), Project), (JsonSerializer(), Status),
           (JsonSerializer(), RunStatus), (JsonSerializer(), Session), (JsonSerializer(), Run),
+          (JsonSerializer(), RunSummary),
           (JsonSerializer(), Computer)] + [(s(), m) for s, m, p in AnalysisManager.get_db_models()]
 
 Indexes = [ProjectIndex, UserIndex, SessionIndex, RunIndex, ComputerIndex] + [m for s, m, p in
@@ -31,16 +38,29 @@ DATA_PATH = settings.DATA_PATH
 db = redis.Redis(host='localhost', port=6379, db=0)
 
 if settings.IS_LOCAL_SETUP:
-    Model.set_db_drivers([FileDbDriver(JsonSerializer(), m, Path(f'{DATA_PATH}/{m.__name__}')) for s, m in Models])
+    db_drivers = [ArrayFileDbDriver(s, m, Path(f'{DATA_PATH}/{m.__name__}')) if isinstance(s, ArraySerializer)
+                  else FileDbDriver(JsonSerializer(), m, Path(f'{DATA_PATH}/{m.__name__}'))
+                  for s, m in Models]
 else:
-    Model.set_db_drivers([RedisDbDriver(s, m, db) for s, m in Models])
+    db_drivers = [RedisHashDbDriver(s, m, db) if issubclass(m, ChangeTracking) else BufferedRedisDbDriver(s, m, db)
+                  for s, m in Models]
+
+Model.set_db_drivers(db_drivers)
+ChangeTracking.set_db_drivers(db_drivers)
+
+if settings.IS_LOCAL_SETUP:
+    output.set_store(output.FileOutputStore(Path(f'{DATA_PATH}/Output')))
+    listing.set_index(listing.FileSortedIndex(Path(f'{DATA_PATH}/Listing')))
+else:
+    output.set_store(output.RedisOutputStore(db))
+    listing.set_index(listing.RedisSortedIndex(db))
 
 if settings.IS_LOCAL_SETUP:
     Index.set_db_drivers(
         [FileIndexDbDriver(YamlSerializer(), m, Path(f'{DATA_PATH}/{m.__name__}.yaml')) for m in Indexes])
 
 else:
-    Index.set_db_drivers([RedisIndexDbDriver(m, db) for m in Indexes])
+    Index.set_db_drivers([BufferedRedisIndexDbDriver(m, db) for m in Indexes])
 
 create_project(settings.FLOAT_PROJECT_TOKEN, 'float project')
 create_project(settings.SAMPLES_PROJECT_TOKEN, 'samples project')
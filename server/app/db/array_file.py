@@ -0,0 +1,46 @@
+from pathlib import Path
+from typing import List, Optional, Type, TYPE_CHECKING
+
+from labml_db.driver.file import FileDbDriver
+from labml_db.serializer.json import JsonSerializer
+from labml_db.types import ModelDict
+
+if TYPE_CHECKING:
+    from labml_db import Model
+    from labml_db.serializer import Serializer
+
+
+class ArrayFileDbDriver(FileDbDriver):
+    """
+    Series collections used to be stored as JSON files with the local setup.
+    Those are read when there is no array file for a key, and replaced by one on its next save.
+    """
+
+    def __init__(self, serializer: 'Serializer', model_cls: Type['Model'], db_path: Path):
+        super().__init__(serializer, model_cls, db_path)
+        self._legacy = FileDbDriver(JsonSerializer(), model_cls, db_path)
+
+    def _get_legacy_path(self, key: str) -> Path:
+        return self._db_path / f'{key}.json'
+
+    def load_dict(self, key: str) -> Optional[ModelDict]:
+        data = super().load_dict(key)
+        if data is None:
+            data = self._legacy.load_dict(key)
+
+        return data
+
+    def save_dict(self, key: str, data: ModelDict):
+        super().save_dict(key, data)
+
+        path = self._get_legacy_path(key)
+        if path.exists():
+            path.unlink()
+
+    def delete(self, key: str):
+        for path in [self._db_path / f'{key}.{self._serializer.file_extension}', self._get_legacy_path(key)]:
+            if path.exists():
+                path.unlink()
+
+    def get_all(self) -> List[str]:
+        return list(dict.fromkeys(super().get_all()))
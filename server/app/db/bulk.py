@@ -0,0 +1,26 @@
+from typing import Iterable, List, Optional, TypeVar
+
+from labml_db import Model, Key
+
+_KT = TypeVar('_KT')
+
+
+def load_many(keys: Iterable[Key[_KT]]) -> List[Optional[_KT]]:
+    """
+    Loads the models of `keys` in one read per model type;
+    a single `MGET` with Redis
+    """
+    keys = [str(k) for k in keys]
+    if not keys:
+        return []
+
+    res: List[Optional[_KT]] = [None] * len(keys)
+    groups = {}
+    for i, k in enumerate(keys):
+        groups.setdefault(k.split(':')[0], []).append(i)
+
+    for idx in groups.values():
+        for i, m in zip(idx, Model.mload([keys[i] for i in idx])):
+            res[i] = m
+
+    return res
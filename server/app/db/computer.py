@@ -1,14 +1,18 @@
 import time
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from labml_db import Model, Key, Index
 
 from . import project
 from .status import create_status, Status
+from .tracking import ChangeTracking
+from .bulk import load_many
+from . import listing
+from . import identity_map
 from .. import settings
 
 
-class Computer(Model['Computer']):
+class Computer(ChangeTracking, Model['Computer']):
     name: str
     comment: str
     start_time: float
@@ -36,7 +40,7 @@ class Computer(Model['Computer']):
 
     @property
     def url(self) -> str:
-        return f'{settings.WEB_URL}/session?uuid={self.session_uuid}'
+        return get_url(self.session_uuid)
 
     def update_computer(self, data: Dict[str, any]) -> None:
         if not self.name:
@@ -72,20 +76,24 @@ class ComputerIndex(Index['Computer']):
     pass
 
 
+def get_url(session_uuid: str) -> str:
+    return f'{settings.WEB_URL}/session?uuid={session_uuid}'
+
+
 def get(session_uuid: str, labml_token: str = '') -> Optional[Computer]:
-    p = project.get_project(labml_token)
+    computer_key = project.get_member(labml_token, listing.COMPUTERS, session_uuid)
 
-    if session_uuid in p.computers:
-        return p.computers[session_uuid].load()
+    if computer_key:
+        return identity_map.load(computer_key)
     else:
         return None
 
 
 def get_or_create(session_uuid: str, computer_uuid: str, labml_token: str = '', computer_ip: str = '') -> Computer:
-    p = project.get_project(labml_token)
+    computer_key = project.get_member(labml_token, listing.COMPUTERS, session_uuid)
 
-    if session_uuid in p.computers:
-        return p.computers[session_uuid].load()
+    if computer_key:
+        return identity_map.load(computer_key)
 
     is_claimed = True
     if labml_token == settings.FLOAT_PROJECT_TOKEN:
@@ -101,30 +109,27 @@ def get_or_create(session_uuid: str, computer_uuid: str, labml_token: str = '',
                         is_claimed=is_claimed,
                         status=status.key,
                         )
-    p.computers[computer.session_uuid] = computer.key
-
     computer.save()
-    p.save()
 
     ComputerIndex.set(computer.session_uuid, computer.key)
+    identity_map.add(computer)
+    project.add_member(labml_token, listing.COMPUTERS, computer.session_uuid, computer.key, computer.start_time)
 
     return computer
 
 
-def get_computers(labml_token: str) -> List[Computer]:
-    res = []
-    p = project.get_project(labml_token)
-    for session_uuid, computer_key in p.computers.items():
-        res.append(computer_key.load())
+def get_computers(labml_token: str, limit: Optional[int] = None,
+                  cursor: Optional[str] = None) -> Tuple[List[Computer], Optional[str]]:
+    computers, cursor = project.get_members(labml_token, listing.COMPUTERS, limit, cursor)
 
-    return res
+    return load_many(computers.values()), cursor
 
 
 def get_computer(session_uuid: str) -> Optional[Computer]:
-    computer_key = ComputerIndex.get(session_uuid)
+    computer_key = identity_map.get_key(ComputerIndex, session_uuid)
 
     if computer_key:
-        return computer_key.load()
+        return identity_map.load(computer_key)
 
     return None
 
@@ -133,6 +138,6 @@ def get_status(session_uuid: str) -> Union[None, Status]:
     c = get_computer(session_uuid)
 
     if c:
-        return c.status.load()
+        return identity_map.load(c.status)
 
     return None
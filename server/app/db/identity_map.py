@@ -0,0 +1,63 @@
+"""
+Models loaded while handling a request, kept on `flask.g` by key.
+
+Loading a key again in the same request returns the same instance, so it costs nothing,
+and a change made through one reference is seen, and saved, by all the others.
+Outside a request, models are loaded as usual.
+"""
+from typing import Dict, Optional, Type, TypeVar
+
+from flask import g, has_app_context
+from labml_db import Model, Key, Index
+
+_KT = TypeVar('_KT')
+
+
+def _get_models() -> Optional[Dict[str, Model]]:
+    if not has_app_context():
+        return None
+
+    if 'models' not in g:
+        g.models = {}
+        g.index_keys = {}
+
+    return g.models
+
+
+def load(key: Key[_KT]) -> Optional[_KT]:
+    models = _get_models()
+    if models is None:
+        return key.load()
+
+    name = str(key)
+    if name not in models:
+        m = key.load()
+        # not kept while missing, since it could be created later in the request
+        if m is None:
+            return None
+        models[name] = m
+
+    return models[name]
+
+
+def add(m: Model) -> None:
+    """
+    Keeps a model created in this request
+    """
+    models = _get_models()
+    if models is not None:
+        models[str(m.key)] = m
+
+
+def get_key(index: Type[Index], value: str) -> Optional[Key]:
+    if _get_models() is None:
+        return index.get(value)
+
+    name = f'{index.__name__}:{value}'
+    if name not in g.index_keys:
+        key = index.get(value)
+        if key is None:
+            return None
+        g.index_keys[name] = key
+
+    return g.index_keys[name]
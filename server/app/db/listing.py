@@ -0,0 +1,223 @@
+"""
+Runs and computers of each project, with their model keys, ordered by start time, newest first.
+
+Lists are read a page at a time, so a page costs the same however many runs a project has.
+A page ends with a cursor, the start time and UUID of its last item, which the next page starts after.
+Redis keeps each list in a sorted set and a hash; the local setup keeps it in a JSON file.
+"""
+import bisect
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from labml_db import Key
+
+from . import unit_of_work
+
+
+RUNS = 'runs'
+COMPUTERS = 'computers'
+
+
+def _get_cursor(member: str, score: float) -> str:
+    return f'{repr(score)}:{member}'
+
+
+def _parse_cursor(cursor: str) -> Tuple[float, str]:
+    score, member = cursor.split(':', 1)
+
+    return float(score), member
+
+
+class SortedIndex:
+    def get_keys(self, name: str, members: List[str]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+    def add(self, name: str, members: Dict[str, Tuple[str, float]]) -> None:
+        """
+        Adds `members`, each with its model key and start time
+        """
+        raise NotImplementedError
+
+    def remove(self, name: str, members: List[str]) -> None:
+        raise NotImplementedError
+
+    def get_page(self, name: str, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[str], Optional[str]]:
+        """
+        Up to `limit` members after `cursor`, and the cursor of the next page if there could be one
+        """
+        raise NotImplementedError
+
+
+class RedisSortedIndex(SortedIndex):
+    """
+    A sorted set of members by start time, and a hash of their model keys
+    """
+
+    def __init__(self, db: redis.Redis):
+        self._db = db
+
+    @staticmethod
+    def _get_key(name: str) -> str:
+        return f'listing:{name}'
+
+    @staticmethod
+    def _get_keys_key(name: str) -> str:
+        return f'listing:{name}:keys'
+
+    def get_keys(self, name: str, members: List[str]) -> List[Optional[str]]:
+        if not members:
+            return []
+
+        return [None if k is None else k.decode('utf-8') for k in self._db.hmget(self._get_keys_key(name), members)]
+
+    def add(self, name: str, members: Dict[str, Tuple[str, float]]) -> None:
+        if not members:
+            return
+
+        with self._db.pipeline() as pipe:
+            pipe.hset(self._get_keys_key(name), mapping={m: k for m, (k, _) in members.items()})
+            pipe.zadd(self._get_key(name), {m: s for m, (_, s) in members.items()})
+            pipe.execute()
+
+    def remove(self, name: str, members: List[str]) -> None:
+        if not members:
+            return
+
+        with self._db.pipeline() as pipe:
+            pipe.hdel(self._get_keys_key(name), *members)
+            pipe.zrem(self._get_key(name), *members)
+            pipe.execute()
+
+    def get_page(self, name: str, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[str], Optional[str]]:
+        key = self._get_key(name)
+
+        start = 0
+        if cursor:
+            score, member = _parse_cursor(cursor)
+            rank = self._db.zrevrank(key, member)
+            if rank is None:
+                # removed since; continue with what came after it
+                start = self._db.zcount(key, f'({repr(score)}', '+inf')
+                ties = self._db.zrangebyscore(key, score, score)
+                start += sum(1 for m in ties if m.decode('utf-8') > member)
+            else:
+                start = rank + 1
+
+        end = -1 if limit is None else start + limit - 1
+        items = [(m.decode('utf-8'), s) for m, s in self._db.zrevrange(key, start, end, withscores=True)]
+
+        next_cursor = None
+        if limit is not None and len(items) == limit:
+            next_cursor = _get_cursor(*items[-1])
+
+        return [m for m, _ in items], next_cursor
+
+
+class FileSortedIndex(SortedIndex):
+    """
+    A JSON file per list, with the model keys and the `(score, member)` pairs in ascending order
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        if not path.exists():
+            path.mkdir(parents=True)
+
+    def _get_path(self, name: str) -> Path:
+        return self._path / f'{name.replace("/", "_")}.json'
+
+    def _load(self, name: str) -> Tuple[Dict[str, str], List[Tuple[float, str]]]:
+        path = self._get_path(name)
+        if not path.exists():
+            return {}, []
+
+        with open(str(path), 'r') as f:
+            data = json.load(f)
+
+        return data['keys'], [(s, m) for s, m in data['order']]
+
+    def _save(self, name: str, keys: Dict[str, str], items: List[Tuple[float, str]]) -> None:
+        with open(str(self._get_path(name)), 'w') as f:
+            json.dump({'keys': keys, 'order': items}, f)
+
+    def get_keys(self, name: str, members: List[str]) -> List[Optional[str]]:
+        keys, _ = self._load(name)
+
+        return [keys.get(m, None) for m in members]
+
+    def add(self, name: str, members: Dict[str, Tuple[str, float]]) -> None:
+        keys, items = self._load(name)
+        items = [(s, m) for s, m in items if m not in members]
+        for m, (k, s) in members.items():
+            keys[m] = k
+            bisect.insort(items, (s, m))
+        self._save(name, keys, items)
+
+    def remove(self, name: str, members: List[str]) -> None:
+        keys, items = self._load(name)
+        members = set(members)
+        for m in members:
+            keys.pop(m, None)
+        self._save(name, keys, [(s, m) for s, m in items if m not in members])
+
+    def get_page(self, name: str, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[str], Optional[str]]:
+        items = self._load(name)[1][::-1]
+
+        start = 0
+        if cursor:
+            score, member = _parse_cursor(cursor)
+            start = next((i for i, (s, m) in enumerate(items) if (s, m) < (score, member)), len(items))
+
+        end = len(items) if limit is None else start + limit
+        items = items[start:end]
+
+        next_cursor = None
+        if limit is not None and len(items) == limit:
+            next_cursor = _get_cursor(items[-1][1], items[-1][0])
+
+        return [m for _, m in items], next_cursor
+
+
+_index: Optional[SortedIndex] = None
+
+
+def set_index(index: SortedIndex) -> None:
+    global _index
+    _index = index
+
+
+def get_name(labml_token: str, kind: str) -> str:
+    return f'{labml_token}/{kind}'
+
+
+def get_key(labml_token: str, kind: str, uuid: str) -> Optional[Key]:
+    key = _index.get_keys(get_name(labml_token, kind), [uuid])[0]
+
+    return None if key is None else Key(key)
+
+
+def get_keys(labml_token: str, kind: str, uuids: List[str]) -> List[Optional[Key]]:
+    return [None if k is None else Key(k) for k in _index.get_keys(get_name(labml_token, kind), uuids)]
+
+
+def add(labml_token: str, kind: str, members: Dict[str, Tuple[Key, float]]) -> None:
+    members = {uuid: (str(k), s) for uuid, (k, s) in members.items()}
+    # the models are written before the list refers to them
+    unit_of_work.defer(lambda: _index.add(get_name(labml_token, kind), members))
+
+
+def remove(labml_token: str, kind: str, uuids: List[str]) -> None:
+    _index.remove(get_name(labml_token, kind), uuids)
+
+
+def get_page(labml_token: str, kind: str, limit: Optional[int] = None,
+             cursor: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    UUIDs of a page of `kind` of a project, newest first, and the cursor of the next page
+    """
+    if limit is not None and limit < 1:
+        return [], None
+
+    return _index.get_page(get_name(labml_token, kind), limit, cursor)
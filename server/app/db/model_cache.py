@@ -0,0 +1,195 @@
+"""
+Models read from Redis, kept decoded in each worker process.
+
+Every write publishes the key on `CHANNEL`, and a listener thread in each process drops
+the keys it hears about, so a model that is polled by several viewers is read and decoded
+once per change instead of once per poll.
+
+Each key has a version, bumped when it is dropped. A load remembers the version before reading
+and keeps what it read only if the version is the same after, so a read that raced a write
+is not kept. The cache is used only while the listener is subscribed, and entries expire after
+`TTL` seconds in case a message is missed.
+
+The cache holds at most `SIZE` bytes. Arrays are kept read-only and shared with the models
+loaded from them, which replace their arrays instead of writing into them; only the dicts and
+lists around them are copied.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import redis
+from labml_db.types import ModelDict
+
+from ..logging import logger
+
+CHANNEL = 'model_cache:invalidate'
+
+# bytes
+SIZE = 64 * 1024 * 1024
+TTL = 60
+# keys with versions kept before they are all dropped
+MAX_VERSIONS = 10 * 1024
+# rough size of a value that is not an array or a string
+OBJECT_SIZE = 64
+
+
+def _freeze(value: Any) -> Tuple[Any, int]:
+    """
+    A copy of `value` with read-only arrays, and its approximate size in bytes
+    """
+    if isinstance(value, np.ndarray):
+        if value.flags.writeable:
+            value = value.copy()
+            value.flags.writeable = False
+        return value, value.nbytes + OBJECT_SIZE
+    elif isinstance(value, dict):
+        res = {}
+        size = OBJECT_SIZE
+        for k, v in value.items():
+            res[k], s = _freeze(v)
+            size += s + OBJECT_SIZE
+        return res, size
+    elif isinstance(value, (list, tuple)):
+        res = []
+        size = OBJECT_SIZE
+        for v in value:
+            v, s = _freeze(v)
+            res.append(v)
+            size += s
+        return res, size
+    elif isinstance(value, (str, bytes)):
+        return value, len(value) + OBJECT_SIZE
+    else:
+        return value, OBJECT_SIZE
+
+
+def _copy(value: Any) -> Any:
+    """
+    A copy of the dicts and lists in `value`, sharing its read-only arrays
+    """
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_copy(v) for v in value]
+    else:
+        return value
+
+
+class ModelCache:
+    def __init__(self, size: int = SIZE, ttl: float = TTL):
+        self.size = size
+        # larger models would push out most of the others
+        self.max_entry_size = size // 16
+        self.ttl = ttl
+        self.is_listening = False
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, int, ModelDict]]' = OrderedDict()
+        self._total_size = 0
+        self._versions: Dict[str, int] = {}
+        # bumped when everything is dropped
+        self._generation = 0
+
+    def get_version(self, key: str) -> Tuple[int, int]:
+        return self._generation, self._versions.get(key, 0)
+
+    def get(self, key: str) -> Optional[ModelDict]:
+        if not self.is_listening:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+
+        # a copy, since the loaded model changes its values
+        return _copy(entry[2])
+
+    def put(self, key: str, version: Tuple[int, int], data: ModelDict) -> None:
+        if not self.is_listening:
+            return
+
+        data, size = _freeze(data)
+        if size > self.max_entry_size:
+            return
+
+        with self._lock:
+            if (self._generation, self._versions.get(key, 0)) != version:
+                return
+            self._remove(key)
+            self._entries[key] = (time.time(), size, data)
+            self._total_size += size
+            while self._total_size > self.size:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_size -= entry[1]
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+            if len(self._versions) > MAX_VERSIONS:
+                self._drop_all()
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _drop_all(self) -> None:
+        self._entries.clear()
+        self._total_size = 0
+        self._versions = {}
+        self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._drop_all()
+
+
+_cache = ModelCache()
+
+
+def get_cache() -> ModelCache:
+    return _cache
+
+
+def invalidate(pipe, key: str) -> None:
+    """
+    Drops `key` here, and in the other processes once `pipe` is executed
+    """
+    _cache.invalidate(key)
+    pipe.publish(CHANNEL, key)
+
+
+class ListenerThread(threading.Thread):
+    def __init__(self, db: redis.Redis):
+        super().__init__(daemon=True)
+        self.db = db
+
+    def run(self):
+        while True:
+            try:
+                pubsub = self.db.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # writes made while not subscribed were not heard
+                _cache.clear()
+                _cache.is_listening = True
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        _cache.invalidate(message['data'].decode('utf-8'))
+            except Exception as e:
+                logger.error(f'model cache listener failed: {e}')
+            finally:
+                _cache.is_listening = False
+                _cache.clear()
+
+            time.sleep(1)
+
+
+def start(db: redis.Redis) -> None:
+    ListenerThread(db).start()
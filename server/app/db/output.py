@@ -0,0 +1,209 @@
+"""
+Terminal output of runs, kept outside the run model.
+
+Output only ever grows, so it is stored in chunks of `CHUNK_SIZE` bytes;
+a Redis list per output, or a directory of segment files with the local setup.
+Offsets are in bytes, and the chunk holding an offset is `offset // CHUNK_SIZE`,
+so reading new output loads only the last few chunks.
+Appends to the same output are serialized, with `WATCH` on Redis and a file lock locally.
+"""
+import fcntl
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import redis
+
+from . import unit_of_work
+
+CHUNK_SIZE = 64 * 1024
+
+
+class OutputStore:
+    def get_count(self, name: str) -> int:
+        raise NotImplementedError
+
+    def get_last(self, name: str) -> bytes:
+        raise NotImplementedError
+
+    def get_chunks(self, name: str, start: int) -> List[bytes]:
+        raise NotImplementedError
+
+    def write(self, name: str, start: int, chunks: List[bytes]) -> None:
+        """
+        Replaces the chunks from `start` onwards with `chunks`
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _get_chunks(count: int, last: Optional[bytes], data: bytes) -> Tuple[int, List[bytes]]:
+        """
+        The chunks to write from, and the chunks, to append `data` to an output
+        with `count` chunks that end with `last`
+        """
+        start = count
+        if count > 0 and len(last) < CHUNK_SIZE:
+            start -= 1
+            data = last + data
+
+        return start, [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+    def append(self, name: str, text: str) -> None:
+        """
+        Appends to the same output must not run concurrently; the stores make sure of it
+        """
+        data = text.encode('utf-8')
+        if not data:
+            return
+
+        count = self.get_count(name)
+        last = self.get_last(name) if count > 0 else None
+        self.write(name, *self._get_chunks(count, last, data))
+
+    def get_size(self, name: str) -> int:
+        count = self.get_count(name)
+        if count == 0:
+            return 0
+
+        return (count - 1) * CHUNK_SIZE + len(self.get_last(name))
+
+    def read(self, name: str, from_offset: int = 0) -> Tuple[str, int]:
+        """
+        Output after `from_offset`, and the offset of its end.
+        Offsets are in bytes of UTF-8; one inside a character is moved to the start of the next one.
+        """
+        start = from_offset // CHUNK_SIZE
+        data = b''.join(self.get_chunks(name, start))
+        end = start * CHUNK_SIZE + len(data)
+        if from_offset >= end:
+            return '', self.get_size(name)
+
+        offset = from_offset - start * CHUNK_SIZE
+        # continuation bytes of a character are 0b10xxxxxx
+        while offset < len(data) and data[offset] & 0xC0 == 0x80:
+            offset += 1
+
+        return data[offset:].decode('utf-8', errors='replace'), end
+
+
+class RedisOutputStore(OutputStore):
+    def __init__(self, db: redis.Redis):
+        self._db = db
+
+    @staticmethod
+    def _get_key(name: str) -> str:
+        return f'output:{name}'
+
+    def get_count(self, name: str) -> int:
+        return self._db.llen(self._get_key(name))
+
+    def get_last(self, name: str) -> bytes:
+        return self._db.lindex(self._get_key(name), -1)
+
+    def get_chunks(self, name: str, start: int) -> List[bytes]:
+        return self._db.lrange(self._get_key(name), start, -1)
+
+    @staticmethod
+    def _write(pipe, key: str, start: int, chunks: List[bytes]) -> None:
+        if start == 0:
+            pipe.delete(key)
+        else:
+            pipe.ltrim(key, 0, start - 1)
+        pipe.rpush(key, *chunks)
+
+    def write(self, name: str, start: int, chunks: List[bytes]) -> None:
+        with self._db.pipeline() as pipe:
+            self._write(pipe, self._get_key(name), start, chunks)
+            pipe.execute()
+
+    def append(self, name: str, text: str) -> None:
+        data = text.encode('utf-8')
+        if not data:
+            return
+
+        key = self._get_key(name)
+
+        def append_chunks(pipe):
+            # retried by `transaction` if another append changes the list after this reads it
+            count = pipe.llen(key)
+            last = pipe.lindex(key, -1) if count > 0 else None
+            pipe.multi()
+            self._write(pipe, key, *self._get_chunks(count, last, data))
+
+        self._db.transaction(append_chunks, key)
+
+
+class FileOutputStore(OutputStore):
+    def __init__(self, path: Path):
+        self._path = path
+
+    def _get_path(self, name: str, idx: Optional[int] = None) -> Path:
+        path = self._path / name
+        if idx is None:
+            return path
+
+        return path / str(idx)
+
+    def get_count(self, name: str) -> int:
+        path = self._get_path(name)
+        if not path.exists():
+            return 0
+
+        return len(os.listdir(path))
+
+    def get_last(self, name: str) -> bytes:
+        with open(self._get_path(name, self.get_count(name) - 1), 'rb') as f:
+            return f.read()
+
+    def get_chunks(self, name: str, start: int) -> List[bytes]:
+        chunks = []
+        for idx in range(start, self.get_count(name)):
+            with open(self._get_path(name, idx), 'rb') as f:
+                chunks.append(f.read())
+
+        return chunks
+
+    def write(self, name: str, start: int, chunks: List[bytes]) -> None:
+        self._get_path(name).mkdir(parents=True, exist_ok=True)
+        for idx, chunk in enumerate(chunks, start):
+            with open(self._get_path(name, idx), 'wb') as f:
+                f.write(chunk)
+
+    def append(self, name: str, text: str) -> None:
+        # next to the chunks, so that it is not counted as one
+        path = self._path / f'{name}.lock'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                super().append(name, text)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+_store: Optional[OutputStore] = None
+
+
+def set_store(store: OutputStore) -> None:
+    global _store
+    _store = store
+
+
+def get_name(run_uuid: str, output_type: str) -> str:
+    return f'{run_uuid}/{output_type}'
+
+
+def append(run_uuid: str, output_type: str, text: str) -> None:
+    """
+    Appends `text` once the run it belongs to is written, so a push that fails
+    and is applied again does not append it twice
+    """
+    name = get_name(run_uuid, output_type)
+    unit_of_work.defer(lambda: _store.append(name, text))
+
+
+def read(run_uuid: str, output_type: str, from_offset: int = 0) -> Tuple[str, int]:
+    # including what was appended in this unit of work
+    unit_of_work.flush()
+
+    return _store.read(get_name(run_uuid, output_type), from_offset)
@@ -1,16 +1,26 @@
 import time
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Set, Tuple, Union
 
 from labml_db import Model, Key, Index
 
 from .run import Run
+from . import run_summary
+from .run_summary import RunSummary
+from .bulk import load_many
+from . import listing
+from . import identity_map
 from .computer import Computer
 
 
+# projects whose runs and computers this process knows to be in `listing`
+_moved_projects: Set[str] = set()
+
+
 class Project(Model['Project']):
     labml_token: str
     is_sharable: float
     name: str
+    # members are kept in `listing`; these hold those saved by earlier versions until they are moved there
     runs: Dict[str, Key[Run]]
     computers: Dict[str, Key[Computer]]
     is_run_added: bool
@@ -25,10 +35,23 @@ class Project(Model['Project']):
                     is_run_added=False,
                     )
 
+    def move_members(self) -> None:
+        if self.runs or self.computers:
+            for kind, members in [(listing.RUNS, self.runs), (listing.COMPUTERS, self.computers)]:
+                models = load_many(members.values())
+                listing.add(self.labml_token, kind,
+                            {uuid: (key, m.start_time if m is not None and m.start_time is not None else 0.)
+                             for (uuid, key), m in zip(members.items(), models)})
+
+            self.runs = {}
+            self.computers = {}
+            self.save()
+
+        _moved_projects.add(self.labml_token)
+
     def get_runs(self) -> List[Run]:
-        res = []
-        for run_uuid, run_key in self.runs.items():
-            res.append(run_key.load())
+        run_uuids, _ = get_members(self.labml_token, listing.RUNS)
+        res = load_many(run_uuids.values())
 
         if self.is_run_added:
             self.is_run_added = False
@@ -36,26 +59,28 @@ class Project(Model['Project']):
 
         return res
 
-    def get_computers(self) -> List[Computer]:
-        res = []
-        for session_uuid, computer_key in self.computers.items():
-            res.append(computer_key.load())
+    def get_run_summaries(self, limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> Tuple[List[RunSummary], Optional[str]]:
+        runs, cursor = get_members(self.labml_token, listing.RUNS, limit, cursor)
+        res = run_summary.mget(runs)
 
-        return res
+        if self.is_run_added:
+            self.is_run_added = False
+            self.save()
 
-    def delete_runs(self, run_uuids: List[str]):
-        for run_uuid in run_uuids:
-            if run_uuid in self.runs:
-                self.runs.pop(run_uuid)
+        return res, cursor
 
-        self.save()
+    def get_computers(self, limit: Optional[int] = None,
+                      cursor: Optional[str] = None) -> Tuple[List[Computer], Optional[str]]:
+        computers, cursor = get_members(self.labml_token, listing.COMPUTERS, limit, cursor)
 
-    def delete_computers(self, session_uuids: List[str]):
-        for session_uuid in session_uuids:
-            if session_uuid in self.computers:
-                self.computers.pop(session_uuid)
+        return load_many(computers.values()), cursor
 
-        self.save()
+    def delete_runs(self, run_uuids: List[str]):
+        remove_members(self.labml_token, listing.RUNS, run_uuids)
+
+    def delete_computers(self, session_uuids: List[str]):
+        remove_members(self.labml_token, listing.COMPUTERS, session_uuids)
 
 
 class ProjectIndex(Index['Project']):
@@ -63,14 +88,54 @@ class ProjectIndex(Index['Project']):
 
 
 def get_project(labml_token: str) -> Union[None, Project]:
-    project_key = ProjectIndex.get(labml_token)
+    project_key = identity_map.get_key(ProjectIndex, labml_token)
 
     if project_key:
-        return project_key.load()
+        return identity_map.load(project_key)
 
     return None
 
 
+def _check_moved(labml_token: str) -> None:
+    if labml_token in _moved_projects:
+        return
+
+    p = get_project(labml_token)
+    if p:
+        p.move_members()
+
+
+def get_member(labml_token: str, kind: str, uuid: str) -> Optional[Key]:
+    _check_moved(labml_token)
+
+    return listing.get_key(labml_token, kind, uuid)
+
+
+def get_members(labml_token: str, kind: str, limit: Optional[int] = None,
+                cursor: Optional[str] = None) -> Tuple[Dict[str, Key], Optional[str]]:
+    """
+    A page of the members of `kind`, newest first, and the cursor of the next page
+    """
+    _check_moved(labml_token)
+
+    uuids, cursor = listing.get_page(labml_token, kind, limit, cursor)
+    keys = listing.get_keys(labml_token, kind, uuids)
+
+    return {uuid: key for uuid, key in zip(uuids, keys) if key is not None}, cursor
+
+
+def add_member(labml_token: str, kind: str, uuid: str, key: Key, start_time: float) -> None:
+    _check_moved(labml_token)
+
+    listing.add(labml_token, kind, {uuid: (key, start_time)})
+
+
+def remove_members(labml_token: str, kind: str, uuids: List[str]) -> None:
+    _check_moved(labml_token)
+
+    listing.remove(labml_token, kind, uuids)
+
+
 def create_project(labml_token: str, name: str):
     project_key = ProjectIndex.get(labml_token)
 
@@ -84,18 +149,12 @@ def create_project(labml_token: str, name: str):
 
 
 def clean_project(labml_token: str):
-    project_key = ProjectIndex.get(labml_token)
-    p = project_key.load()
+    runs, _ = get_members(labml_token, listing.RUNS)
+    statuses = load_many(r.status for r in load_many(runs.values()))
 
     delete_list = []
-    for run_uuid, run_key in p.runs.items():
-        r = run_key.load()
-        s = r.status.load()
-
+    for run_uuid, s in zip(runs.keys(), statuses):
         if (time.time() - 86400) > s.last_updated_time:
             delete_list.append(run_uuid)
 
-    for run_uuid in delete_list:
-        p.runs.pop(run_uuid)
-
-    p.save()
+    remove_members(labml_token, listing.RUNS, delete_list)
@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional, Set, Type, TYPE_CHECKING
+
+import redis
+from labml_db.types import ModelDict
+
+from . import model_cache
+from .unit_of_work import BufferedRedisDbDriver, get_current
+
+if TYPE_CHECKING:
+    from labml_db import Model
+    from labml_db.serializer import Serializer
+
+# always present, so a model with only default values still exists
+EXISTS_FIELD = '_'
+
+
+class RedisHashDbDriver(BufferedRedisDbDriver):
+    """
+    Stores each field of a model as a field of a Redis hash, serialized on its own,
+    so that a save can write only the fields that changed.
+
+    Models stored earlier as a single string are read as they are,
+    and replaced by a hash the first time they are saved.
+    """
+
+    def __init__(self, serializer: 'Serializer', model_cls: Type['Model'], db: 'redis.Redis'):
+        super().__init__(serializer, model_cls, db)
+        self._legacy_keys: Set[str] = set()
+
+    def _decode(self, fields: Dict[bytes, bytes]) -> Optional[ModelDict]:
+        if not fields:
+            return None
+
+        data = {}
+        for field, value in fields.items():
+            if field.decode('utf-8') != EXISTS_FIELD:
+                data.update(self._serializer.from_string(value))
+
+        return data
+
+    def _load_legacy(self, key: str) -> Optional[ModelDict]:
+        self._legacy_keys.add(key)
+
+        return self._serializer.from_string(self._db.get(key))
+
+    def _read(self, key: str) -> Optional[ModelDict]:
+        try:
+            return self._decode(self._db.hgetall(key))
+        except redis.ResponseError:
+            return self._load_legacy(key)
+
+    def _mread(self, key: List[str]) -> List[Optional[ModelDict]]:
+        with self._db.pipeline(transaction=False) as pipe:
+            for k in key:
+                pipe.hgetall(k)
+            res = pipe.execute(raise_on_error=False)
+
+        return [self._load_legacy(k) if isinstance(r, redis.ResponseError) else self._decode(r)
+                for k, r in zip(key, res)]
+
+    def write(self, pipe, key: str, data: Optional[ModelDict], fields: Optional[Set[str]] = None) -> None:
+        if data is None:
+            super().write(pipe, key, data)
+            return
+
+        pipe.sadd(self._keys_list_key, key)
+        if fields is None or key in self._legacy_keys:
+            pipe.delete(key)
+            pipe.hset(key, EXISTS_FIELD, '')
+            self._legacy_keys.discard(key)
+            fields = set(data.keys())
+
+        changed = {f: self._serializer.to_string({f: data[f]}) for f in fields if f in data}
+        removed = [f for f in fields if f not in data]
+        if changed:
+            pipe.hset(key, mapping=changed)
+        if removed:
+            pipe.hdel(key, *removed)
+        model_cache.invalidate(pipe, key)
+
+    def save_fields(self, key: str, data: ModelDict, fields: Optional[Set[str]]):
+        """
+        Saves `fields` of `data`, or all of it with `None`; fields missing from `data` are removed
+        """
+        work = get_current()
+        if work is not None:
+            work.add(self, key, data, fields)
+            return
+
+        with self.get_pipeline() as pipe:
+            self.write(pipe, key, data, fields)
+            pipe.execute()
+
+    def save_dict(self, key: str, data: ModelDict):
+        self.save_fields(key, data, None)
+
+    def msave_dict(self, key: List[str], data: List[ModelDict]):
+        for k, d in zip(key, data):
+            self.save_fields(k, d, None)
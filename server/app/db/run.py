@@ -1,11 +1,18 @@
 import time
-from typing import Dict, List, Optional, Union, NamedTuple
+from typing import Dict, List, Optional, Tuple, Union, NamedTuple
 
 from labml_db import Model, Key, Index
 
 from ..utils.mix_panel import MixPanelEvent
 from . import project
+from . import output
+from . import run_summary
+from .run_summary import RunSummary
+from .bulk import load_many
+from . import listing
+from . import identity_map
 from .status import create_status, Status
+from .tracking import ChangeTracking
 from .. import settings
 from ..logging import logger
 
@@ -17,7 +24,7 @@ class CardInfo(NamedTuple):
     queue_size: int = 0
 
 
-class Run(Model['Run']):
+class Run(ChangeTracking, Model['Run']):
     name: str
     comment: str
     note: str
@@ -33,6 +40,7 @@ class Run(Model['Run']):
     is_claimed: bool
     status: Key[Status]
     configs: Dict[str, any]
+    # output is kept in `output`; these hold output saved by earlier versions until it is moved there
     stdout: str
     stdout_unmerged: str
     logger: str
@@ -74,7 +82,7 @@ class Run(Model['Run']):
 
     @property
     def url(self) -> str:
-        return f'{settings.WEB_URL}/run?uuid={self.run_uuid}'
+        return get_url(self.run_uuid)
 
     def update_run(self, data: Dict[str, any]) -> None:
         if not self.name:
@@ -96,15 +104,17 @@ class Run(Model['Run']):
 
         if 'configs' in data:
             self.configs.update(data.get('configs', {}))
+
+        self.move_output()
         if 'stdout' in data and data['stdout']:
             stdout_processed, self.stdout_unmerged = self.merge_output(self.stdout_unmerged, data['stdout'])
-            self.stdout += stdout_processed
+            output.append(self.run_uuid, 'stdout', stdout_processed)
         if 'logger' in data and data['logger']:
             logger_processed, self.logger_unmerged = self.merge_output(self.logger_unmerged, data['logger'])
-            self.logger += logger_processed
+            output.append(self.run_uuid, 'logger', logger_processed)
         if 'stderr' in data and data['stderr']:
             stderr_processed, self.stderr_unmerged = self.merge_output(self.stderr_unmerged, data['stderr'])
-            self.stderr += stderr_processed
+            output.append(self.run_uuid, 'stderr', stderr_processed)
 
         if not self.indicators:
             self.indicators = data.get('indicators', {})
@@ -123,21 +133,47 @@ class Run(Model['Run']):
 
     @staticmethod
     def format_output(output: str) -> (str, str):
+        """
+        Splits `output` into complete lines and the unfinished last line,
+        keeping only what follows the last carriage return of each line
+        """
+        lines = output.split('\n')
         res = []
-        temp = ''
-        for i, c in enumerate(output):
-            if c == '\n':
-                temp += '\n'
-                res.append(temp)
-                temp = ''
-            elif c == '\r' and len(output) > i + 1 and output[i + 1] == '\n':
-                pass
-            elif c == '\r':
-                temp = ''
-            else:
-                temp += c
-
-        return ''.join(res), temp
+        for line in lines[:-1]:
+            if line.endswith('\r'):
+                line = line[:-1]
+            res.append(line[line.rfind('\r') + 1:] + '\n')
+
+        temp = lines[-1]
+
+        return ''.join(res), temp[temp.rfind('\r') + 1:]
+
+    def move_output(self) -> None:
+        """
+        Moves output stored in the run by earlier versions to the output store
+        """
+        if self.stdout:
+            output.append(self.run_uuid, 'stdout', self.stdout)
+            self.stdout = ''
+        if self.logger:
+            output.append(self.run_uuid, 'logger', self.logger)
+            self.logger = ''
+        if self.stderr:
+            output.append(self.run_uuid, 'stderr', self.stderr)
+            self.stderr = ''
+
+    def get_output(self, output_type: str, from_offset: int = 0) -> Dict[str, Union[str, int]]:
+        if self.stdout or self.logger or self.stderr:
+            self.move_output()
+            self.save()
+
+        processed, offset = output.read(self.run_uuid, output_type, from_offset)
+
+        return {
+            'output': processed,
+            'unmerged': getattr(self, f'{output_type}_unmerged'),
+            'offset': offset,
+        }
 
     @staticmethod
     def format_remote_repo(urls: str):
@@ -188,9 +224,6 @@ class Run(Model['Run']):
             'commit_message': self.commit_message,
             'is_claimed': self.is_claimed,
             'configs': configs,
-            'stdout': self.stdout + self.stdout_unmerged,
-            'logger': self.logger + self.logger_unmerged,
-            'stderr': self.stderr + self.stderr_unmerged,
         }
 
     def get_summary(self) -> Dict[str, str]:
@@ -210,26 +243,31 @@ class Run(Model['Run']):
             self.note = data.get('note', self.note)
 
         self.save()
+        run_summary.save(self)
 
 
 class RunIndex(Index['Run']):
     pass
 
 
+def get_url(run_uuid: str) -> str:
+    return f'{settings.WEB_URL}/run?uuid={run_uuid}'
+
+
 def get(run_uuid: str, labml_token: str = '') -> Optional[Run]:
-    p = project.get_project(labml_token)
+    run_key = project.get_member(labml_token, listing.RUNS, run_uuid)
 
-    if run_uuid in p.runs:
-        return p.runs[run_uuid].load()
+    if run_key:
+        return identity_map.load(run_key)
     else:
         return None
 
 
 def get_or_create(run_uuid: str, labml_token: str = '', run_ip: str = '') -> Run:
-    p = project.get_project(labml_token)
+    run_key = project.get_member(labml_token, listing.RUNS, run_uuid)
 
-    if run_uuid in p.runs:
-        return p.runs[run_uuid].load()
+    if run_key:
+        return identity_map.load(run_key)
 
     if labml_token == settings.FLOAT_PROJECT_TOKEN:
         is_claimed = False
@@ -246,13 +284,15 @@ def get_or_create(run_uuid: str, labml_token: str = '', run_ip: str = '') -> Run
               is_claimed=is_claimed,
               status=status.key,
               )
-    p.runs[run.run_uuid] = run.key
-    p.is_run_added = True
-
     run.save()
+
+    p = project.get_project(labml_token)
+    p.is_run_added = True
     p.save()
 
     RunIndex.set(run.run_uuid, run.key)
+    identity_map.add(run)
+    project.add_member(labml_token, listing.RUNS, run.run_uuid, run.key, run.start_time)
 
     MixPanelEvent.track('run_created', {'run_uuid': run_uuid,
                                         'run_ip': run_ip,
@@ -263,19 +303,23 @@ def get_or_create(run_uuid: str, labml_token: str = '', run_ip: str = '') -> Run
 
 
 def get_runs(labml_token: str) -> List[Run]:
-    res = []
-    p = project.get_project(labml_token)
-    for run_uuid, run_key in p.runs.items():
-        res.append(run_key.load())
+    runs, _ = project.get_members(labml_token, listing.RUNS)
+
+    return load_many(runs.values())
+
+
+def get_run_summaries(labml_token: str, limit: Optional[int] = None,
+                      cursor: Optional[str] = None) -> Tuple[List[RunSummary], Optional[str]]:
+    runs, cursor = project.get_members(labml_token, listing.RUNS, limit, cursor)
 
-    return res
+    return run_summary.mget(runs), cursor
 
 
 def get_run(run_uuid: str) -> Optional[Run]:
-    run_key = RunIndex.get(run_uuid)
+    run_key = identity_map.get_key(RunIndex, run_uuid)
 
     if run_key:
-        return run_key.load()
+        return identity_map.load(run_key)
 
     return None
 
@@ -284,6 +328,6 @@ def get_status(run_uuid: str) -> Union[None, Status]:
     r = get_run(run_uuid)
 
     if r:
-        return r.status.load()
+        return identity_map.load(r.status)
 
     return None
@@ -0,0 +1,96 @@
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from labml_db import Model, Key
+
+from .status import Status, RunStatus, get_actual_status
+from .bulk import load_many
+from . import identity_map
+
+if TYPE_CHECKING:
+    from .run import Run
+
+
+class RunSummary(Model['RunSummary']):
+    """
+    What runs lists show of a run, kept apart from the run and its status so that
+    a list loads one small model per run.
+    It is saved under a key made from the run UUID, so a list needs no index lookups.
+    """
+    run_uuid: str
+    name: str
+    comment: str
+    start_time: float
+    last_updated_time: float
+    run_status: Dict[str, any]
+
+    @classmethod
+    def defaults(cls):
+        return dict(run_uuid='',
+                    name='',
+                    comment='',
+                    start_time=None,
+                    last_updated_time=None,
+                    run_status={},
+                    )
+
+    def get_data(self) -> Dict[str, any]:
+        run_status = dict(self.run_status)
+        run_status['status'] = get_actual_status(run_status.get('status', ''), self.last_updated_time)
+
+        return {
+            'run_uuid': self.run_uuid,
+            'name': self.name,
+            'comment': self.comment,
+            'start_time': self.start_time,
+            'last_updated_time': self.last_updated_time,
+            'run_status': run_status,
+        }
+
+
+def get_key(run_uuid: str) -> str:
+    return f'RunSummary:{run_uuid}'
+
+
+def create(r: 'Run', s: Status, run_status: RunStatus) -> RunSummary:
+    return RunSummary(get_key(r.run_uuid),
+                      run_uuid=r.run_uuid,
+                      name=r.name,
+                      comment=r.comment,
+                      start_time=r.start_time,
+                      last_updated_time=s.last_updated_time,
+                      run_status=run_status.to_dict(),
+                      )
+
+
+def save(r: 'Run', s: Optional[Status] = None) -> RunSummary:
+    if s is None:
+        s = identity_map.load(r.status)
+
+    summary = create(r, s, identity_map.load(s.run_status))
+    summary.save()
+
+    return summary
+
+
+def mget(runs: Dict[str, 'Key[Run]']) -> List[RunSummary]:
+    """
+    Summaries of `runs`, a map of run UUIDs to runs;
+    those of runs from before summaries were kept are saved on the way,
+    and runs that are no longer stored are left out
+    """
+    run_uuids = list(runs.keys())
+    summaries = RunSummary.mload([get_key(run_uuid) for run_uuid in run_uuids])
+
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    if missing:
+        missing_runs = load_many(runs[run_uuids[i]] for i in missing)
+        missing = [(i, r) for i, r in zip(missing, missing_runs) if r is not None]
+        statuses = load_many(r.status for _, r in missing)
+        missing = [(i, r, s) for (i, r), s in zip(missing, statuses) if s is not None]
+        run_statuses = load_many(s.run_status for _, _, s in missing)
+        for (i, r, s), run_status in zip(missing, run_statuses):
+            if run_status is not None:
+                summaries[i] = create(r, s, run_status)
+        RunSummary.msave([summaries[i] for i, _, _ in missing if summaries[i] is not None])
+
+    return [summary for summary in summaries if summary is not None]
@@ -4,6 +4,7 @@ from uuid import uuid4
 from labml_db import Model, Key, Index
 
 from .user import User
+from . import identity_map
 
 EXPIRATION_DELAY = 60 * 60 * 24 * 30
 
@@ -41,7 +42,7 @@ def get_or_create(session_id: str) -> Session:
     if not session_id:
         session_id = gen_session_id()
 
-    session_key = SessionIndex.get(session_id)
+    session_key = identity_map.get_key(SessionIndex, session_id)
 
     if not session_key:
         session = Session(session_id=session_id,
@@ -50,10 +51,11 @@ def get_or_create(session_id: str) -> Session:
         session.save()
 
         SessionIndex.set(session.session_id, session.key)
+        identity_map.add(session)
 
         return session
 
-    return session_key.load()
+    return identity_map.load(session_key)
 
 
 def delete(session: Session) -> None:
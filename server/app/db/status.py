@@ -1,12 +1,14 @@
 import time
-from typing import Dict
+from typing import Dict, Optional
 
 from labml_db import Model, Key
 
 from ..enums import RunEnums
+from . import identity_map
+from .tracking import ChangeTracking
 
 
-class RunStatus(Model['RunStatusModel']):
+class RunStatus(ChangeTracking, Model['RunStatusModel']):
     status: str
     details: object
     time: float
@@ -19,7 +21,7 @@ class RunStatus(Model['RunStatusModel']):
                     )
 
 
-class Status(Model['Status']):
+class Status(ChangeTracking, Model['Status']):
     last_updated_time: float
     run_status: Key[RunStatus]
 
@@ -29,8 +31,10 @@ class Status(Model['Status']):
                     run_status=None
                     )
 
-    def get_data(self) -> Dict[str, any]:
-        run_status = self.run_status.load().to_dict()
+    def get_data(self, run_status: Optional[RunStatus] = None) -> Dict[str, any]:
+        if run_status is None:
+            run_status = identity_map.load(self.run_status)
+        run_status = run_status.to_dict()
         run_status['status'] = self.get_actual_status(run_status.get('status', ''))
 
         return {
@@ -43,7 +47,7 @@ class Status(Model['Status']):
 
         s = data.get('status', {})
         if s:
-            run_status = self.run_status.load()
+            run_status = identity_map.load(self.run_status)
 
             run_status.status = s.get('status', run_status.status)
             run_status.details = s.get('details', run_status.details)
@@ -54,20 +58,24 @@ class Status(Model['Status']):
         self.save()
 
     def get_actual_status(self, status: str) -> str:
-        not_responding = False
-
-        if status == RunEnums.RUN_IN_PROGRESS:
-            if self.last_updated_time is not None:
-                time_diff = (time.time() - self.last_updated_time) / 60
-                if time_diff > 15:
-                    not_responding = True
-
-        if not_responding:
-            return RunEnums.RUN_NOT_RESPONDING
-        elif status == '':
-            return RunEnums.RUN_UNKNOWN
-        else:
-            return status
+        return get_actual_status(status, self.last_updated_time)
+
+
+def get_actual_status(status: str, last_updated_time: float) -> str:
+    not_responding = False
+
+    if status == RunEnums.RUN_IN_PROGRESS:
+        if last_updated_time is not None:
+            time_diff = (time.time() - last_updated_time) / 60
+            if time_diff > 15:
+                not_responding = True
+
+    if not_responding:
+        return RunEnums.RUN_NOT_RESPONDING
+    elif status == '':
+        return RunEnums.RUN_UNKNOWN
+    else:
+        return status
 
 
 def create_status() -> Status:
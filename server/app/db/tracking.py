@@ -0,0 +1,67 @@
+import copy
+from typing import Dict, List, Optional, Set
+
+from labml_db.driver import DbDriver
+from labml_db.types import ModelDict, Primitive
+
+
+def _copy(value: Primitive) -> Primitive:
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+
+    return value
+
+
+class ChangeTracking:
+    """
+    Keeps the values a model was loaded with, so that `save` writes only the fields that changed
+    and nothing at all when none did. Models that were never loaded are saved whole.
+
+    It goes before `Model` in the bases, so that its `save` is used.
+    """
+    __db_drivers: Dict[str, DbDriver] = {}
+
+    _snapshot: Optional[ModelDict]
+
+    def __init__(self, key: Optional[str] = None, **kwargs):
+        super().__init__(key, **kwargs)
+
+        # only models loaded from the database are constructed with a key
+        if key is None:
+            self._snapshot = None
+        else:
+            self._take_snapshot(self.to_dict())
+
+    @staticmethod
+    def set_db_drivers(db_drivers: List[DbDriver]):
+        ChangeTracking.__db_drivers = {d.model_name: d for d in db_drivers}
+
+    def _take_snapshot(self, data: ModelDict) -> None:
+        self._snapshot = {k: _copy(v) for k, v in data.items()}
+
+    def get_changed_fields(self, data: ModelDict) -> Optional[Set[str]]:
+        """
+        Fields that differ from the last load or save; `None` if the model was never loaded
+        """
+        if self._snapshot is None:
+            return None
+
+        changed = {k for k, v in data.items() if k not in self._snapshot or
+                   not (self._snapshot[k] is v or self._snapshot[k] == v)}
+        changed.update(k for k in self._snapshot if k not in data)
+
+        return changed
+
+    def save(self):
+        data = self.to_dict()
+        fields = self.get_changed_fields(data)
+        if fields is not None and not fields:
+            return
+
+        db_driver = ChangeTracking.__db_drivers[self.__class__.__name__]
+        if fields is not None and hasattr(db_driver, 'save_fields'):
+            db_driver.save_fields(self._key, data, fields)
+        else:
+            db_driver.save_dict(self._key, data)
+
+        self._take_snapshot(data)
@@ -0,0 +1,277 @@
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from labml_db.driver.redis import RedisDbDriver
+from labml_db.index_driver.redis import RedisIndexDbDriver
+from labml_db.types import ModelDict
+
+from . import model_cache
+
+_local = threading.local()
+
+
+class UnitOfWork:
+    """
+    Model saves and deletes made on a thread while a unit of work is open.
+
+    Only the last save of each key is kept, and all of them are written in one Redis pipeline
+    when the unit of work ends. Models are serialized then, so a change made after a model's
+    last save is written as well.
+    Drivers that write single fields get the union of the fields changed by all the saves,
+    or `None` if any of them wrote the whole model.
+
+    Index entries are written in the same pipeline after the models, and other writes that
+    refer to models, like list entries and output, are deferred until after it. So a unit of work
+    that fails before it ends writes nothing, and can be applied again.
+    """
+    pending: Dict[str, Tuple['BufferedRedisDbDriver', Optional[ModelDict], Optional[Set[str]]]]
+    indexes: Dict[Tuple[str, str], Tuple['BufferedRedisIndexDbDriver', str]]
+    deferred: List[Callable[[], None]]
+    # whether anything has been written yet
+    is_written: bool
+
+    def __init__(self):
+        self.pending = {}
+        self.indexes = {}
+        self.deferred = []
+        self.is_written = False
+
+    def add(self, driver: 'BufferedRedisDbDriver', key: str, data: Optional[ModelDict],
+            fields: Optional[Set[str]] = None) -> None:
+        if fields is not None and key in self.pending:
+            pending_fields = self.pending[key][2]
+            fields = None if pending_fields is None else pending_fields | fields
+
+        self.pending[key] = (driver, data, fields)
+
+    def set_index(self, driver: 'BufferedRedisIndexDbDriver', index_key: str, model_key: str) -> None:
+        self.indexes[(driver.index_name, index_key)] = (driver, model_key)
+
+    def get_index(self, driver: 'BufferedRedisIndexDbDriver', index_key: str) -> Optional[str]:
+        pending = self.indexes.get((driver.index_name, index_key), None)
+
+        return None if pending is None else pending[1]
+
+    def flush(self) -> None:
+        if self.pending or self.indexes:
+            if self.pending:
+                driver = next(iter(self.pending.values()))[0]
+            else:
+                driver = next(iter(self.indexes.values()))[0]
+            self.is_written = True
+            with driver.get_pipeline() as pipe:
+                for key, (driver, data, fields) in self.pending.items():
+                    driver.write(pipe, key, data, fields)
+                for (_, index_key), (driver, model_key) in self.indexes.items():
+                    driver.write(pipe, index_key, model_key)
+                pipe.execute()
+
+            self.pending = {}
+            self.indexes = {}
+
+        while self.deferred:
+            self.is_written = True
+            self.deferred.pop(0)()
+
+
+def get_current() -> Optional[UnitOfWork]:
+    return getattr(_local, 'work', None)
+
+
+def flush() -> None:
+    """
+    Writes what the open unit of work has pending, so that it can be read back
+    """
+    work = get_current()
+    if work is not None:
+        work.flush()
+
+
+def defer(func: Callable[[], None]) -> None:
+    """
+    Calls `func` after the models of the open unit of work are written, or now if there is none
+    """
+    work = get_current()
+    if work is None:
+        func()
+    else:
+        work.deferred.append(func)
+
+
+@contextmanager
+def begin():
+    """
+    Opens a unit of work on this thread, or joins the one already open
+    """
+    work = get_current()
+    if work is not None:
+        yield work
+        return
+
+    work = UnitOfWork()
+    _local.work = work
+    try:
+        yield work
+    finally:
+        _local.work = None
+
+    # not reached if it failed; what was pending is dropped, so that it can be applied again
+    work.flush()
+
+
+def unit_of_work(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with begin():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class BufferedRedisDbDriver(RedisDbDriver):
+    """
+    Keeps saves and deletes in the open unit of work, if there is one.
+    Loads see the pending state, and otherwise go through the model cache.
+    """
+
+    def get_pipeline(self):
+        return self._db.pipeline()
+
+    def write(self, pipe, key: str, data: Optional[ModelDict], fields: Optional[Set[str]] = None) -> None:
+        if data is None:
+            pipe.srem(self._keys_list_key, key)
+            pipe.delete(key)
+        else:
+            pipe.sadd(self._keys_list_key, key)
+            pipe.set(key, self._serializer.to_string(data))
+        model_cache.invalidate(pipe, key)
+
+    def _write_now(self, key: List[str], data: List[Optional[ModelDict]]) -> None:
+        with self.get_pipeline() as pipe:
+            for k, d in zip(key, data):
+                self.write(pipe, k, d)
+            pipe.execute()
+
+    def _read(self, key: str) -> Optional[ModelDict]:
+        return super().load_dict(key)
+
+    def _mread(self, key: List[str]) -> List[Optional[ModelDict]]:
+        return super().mload_dict(key)
+
+    def _get_pending(self, key: str) -> Tuple[bool, Optional[ModelDict]]:
+        work = get_current()
+        if work is None or key not in work.pending:
+            return False, None
+
+        data = work.pending[key][1]
+        if data is None:
+            return True, None
+
+        # a copy, so the loaded model does not share values with the saved one
+        return True, self._serializer.from_string(self._serializer.to_string(data))
+
+    def load_dict(self, key: str) -> Optional[ModelDict]:
+        is_pending, data = self._get_pending(key)
+        if is_pending:
+            return data
+
+        cache = model_cache.get_cache()
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+        version = cache.get_version(key)
+        data = self._read(key)
+        if data is not None:
+            cache.put(key, version, data)
+
+        return data
+
+    def mload_dict(self, key: List[str]) -> List[Optional[ModelDict]]:
+        work = get_current()
+        if work is not None and any(k in work.pending for k in key):
+            return [self.load_dict(k) for k in key]
+
+        cache = model_cache.get_cache()
+        res = [cache.get(k) for k in key]
+        missing = [k for k, d in zip(key, res) if d is None]
+        if not missing:
+            return res
+
+        versions = [cache.get_version(k) for k in missing]
+        loaded = dict(zip(missing, self._mread(missing)))
+        for k, v in zip(missing, versions):
+            if loaded[k] is not None:
+                cache.put(k, v, loaded[k])
+
+        return [loaded[k] if d is None else d for k, d in zip(key, res)]
+
+    def save_dict(self, key: str, data: ModelDict):
+        work = get_current()
+        if work is None:
+            return self._write_now([key], [data])
+
+        work.add(self, key, data)
+
+    def msave_dict(self, key: List[str], data: List[ModelDict]):
+        work = get_current()
+        if work is None:
+            return self._write_now(key, data)
+
+        for k, d in zip(key, data):
+            work.add(self, k, d)
+
+    def delete(self, key: str):
+        work = get_current()
+        if work is None:
+            return self._write_now([key], [None])
+
+        work.add(self, key, None)
+
+
+class BufferedRedisIndexDbDriver(RedisIndexDbDriver):
+    """
+    Keeps index entries in the open unit of work, if there is one, to be written after its models;
+    otherwise other requests could find a key whose model does not exist yet.
+    """
+
+    def get_pipeline(self):
+        return self._db.pipeline()
+
+    def write(self, pipe, index_key: str, model_key: str) -> None:
+        pipe.hset(self._index_key, index_key, model_key)
+
+    def get(self, index_key: str) -> str:
+        work = get_current()
+        if work is not None:
+            model_key = work.get_index(self, index_key)
+            if model_key is not None:
+                return model_key
+
+        return super().get(index_key)
+
+    def mget(self, index_key: List[str]) -> List[str]:
+        res = super().mget(index_key)
+        work = get_current()
+        if work is None:
+            return res
+
+        pending = [work.get_index(self, k) for k in index_key]
+
+        return [r if p is None else p for r, p in zip(res, pending)]
+
+    def set(self, index_key: str, model_key: str):
+        work = get_current()
+        if work is None:
+            return super().set(index_key, model_key)
+
+        work.set_index(self, index_key, model_key)
+
+    def delete(self, index_key: str):
+        work = get_current()
+        if work is not None:
+            work.indexes.pop((self.index_name, index_key), None)
+
+        super().delete(index_key)
@@ -3,6 +3,8 @@ from typing import List, NamedTuple, Dict
 from labml_db import Model, Key, Index
 
 from .project import Project, ProjectIndex
+from .bulk import load_many
+from . import identity_map
 from ..utils import gen_token
 
 
@@ -28,16 +30,18 @@ class User(Model['User']):
 
     @property
     def default_project(self) -> Project:
-        return self.projects[0].load()
+        return identity_map.load(self.projects[0])
 
     def get_data(self) -> Dict[str, any]:
+        projects = load_many(self.projects)
+
         return {
             'name': self.name,
             'email': self.email,
             'picture': self.picture,
             'theme': self.theme,
-            'projects': [p.load().labml_token for p in self.projects],
-            'default_project': self.default_project.labml_token
+            'projects': [p.labml_token for p in projects],
+            'default_project': projects[0].labml_token
         }
 
     def set_user(self, data):
@@ -34,3 +34,15 @@ INDICATORS = [SeriesEnums.GRAD,
               SeriesEnums.TIME,
               SeriesEnums.MODULE,
               SeriesEnums.METRIC]
+
+
+class DownsampleEnums:
+    LTTB = 'lttb'
+    MIN_MAX = 'minmax'
+    MEAN = 'mean'
+
+
+class SmoothingEnums:
+    BOX = 'box'
+    EMA = 'ema'
+    GAUSSIAN = 'gaussian'
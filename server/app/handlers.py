@@ -3,23 +3,62 @@ import typing
 
 import flask
 import werkzeug.wrappers
-from flask import request, make_response, jsonify
+from flask import request, make_response
 
 from .logging import logger
 from . import settings
 from . import auth
 from . import utils
 from .db import run
+from .db import run_summary
 from .db import computer
 from .db import session
 from .db import user
 from .db import project
+from .db import listing
+from .db import identity_map
+from .db.bulk import load_many
+from .db.unit_of_work import unit_of_work
 from .utils import mix_panel
 from .analyses import AnalysisManager
+from . import ingestion
 
 request = typing.cast(werkzeug.wrappers.Request, request)
 
 
+def get_token_error() -> typing.Dict[str, str]:
+    if request.args.get('labml_token', ''):
+        return {'error': 'invalid_token',
+                'message': 'Please create a valid token at https://web.lab-ml.com.\n'
+                           'Click on the experiment link to monitor the experiment and '
+                           'add it to your experiments list.'}
+    else:
+        return {'warning': 'empty_token',
+                'message': 'Please create a valid token at https://web.lab-ml.com.\n'
+                           'Click on the experiment link to monitor the experiment and '
+                           'add it to your experiments list.'}
+
+
+def get_push_data() -> typing.List[typing.Dict[str, any]]:
+    if isinstance(request.json, list):
+        return request.json
+    else:
+        return [request.json]
+
+
+def get_queued_push_data() -> typing.Optional[typing.List[typing.Dict[str, any]]]:
+    """
+    The push data, checked before it is queued, since it is applied after the response
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        data = [data]
+    if not all(isinstance(d, dict) for d in data):
+        return None
+
+    return data
+
+
 def is_new_run_added():
     is_run_added = False
     u = auth.get_auth_user()
@@ -67,6 +106,7 @@ def sign_out() -> flask.Response:
 
 
 @mix_panel.MixPanelEvent.time_this(0.4)
+@unit_of_work
 def update_computer() -> flask.Response:
     errors = []
 
@@ -79,20 +119,35 @@ def update_computer() -> flask.Response:
         error = {'error': 'invalid_computer_uuid',
                  'message': f'Invalid Computer UUID'}
         errors.append(error)
-        return jsonify({'errors': errors})
+        return utils.json_response({'errors': errors})
 
     if len(session_uuid) < 10:
         error = {'error': 'invalid_session_uuid',
                  'message': f'Invalid Session UUID'}
         errors.append(error)
-        return jsonify({'errors': errors})
+        return utils.json_response({'errors': errors})
 
     if utils.check_version(version, settings.LABML_VERSION):
         error = {'error': 'labml_outdated',
                  'message': f'Your labml client is outdated, please upgrade: '
                             'pip install labml --upgrade'}
         errors.append(error)
-        return jsonify({'errors': errors})
+        return utils.json_response({'errors': errors})
+
+    if ingestion.is_enabled():
+        data = get_queued_push_data()
+        if data is None:
+            error = {'error': 'invalid_data',
+                     'message': f'Invalid push data'}
+            errors.append(error)
+            return utils.json_response({'errors': errors})
+
+        if not project.ProjectIndex.get(token) and not computer.ComputerIndex.get(session_uuid):
+            errors.append(get_token_error())
+
+        ingestion.push(ingestion.COMPUTER, session_uuid, data)
+
+        return utils.json_response({'errors': errors, 'url': computer.get_url(session_uuid)})
 
     p = project.get_project(labml_token=token)
     if not p:
@@ -100,36 +155,41 @@ def update_computer() -> flask.Response:
 
     c = computer.get(session_uuid, token)
     if not c and not p:
-        if request.args.get('labml_token', ''):
-            error = {'error': 'invalid_token',
-                     'message': 'Please create a valid token at https://web.lab-ml.com.\n'
-                                'Click on the experiment link to monitor the experiment and '
-                                'add it to your experiments list.'}
-        else:
-            error = {'warning': 'empty_token',
-                     'message': 'Please create a valid token at https://web.lab-ml.com.\n'
-                                'Click on the experiment link to monitor the experiment and '
-                                'add it to your experiments list.'}
-        errors.append(error)
+        errors.append(get_token_error())
 
-    c = computer.get_or_create(session_uuid, computer_uuid, token, request.remote_addr)
-    s = c.status.load()
+    c = _apply_computer_update(token, get_push_data())
 
-    if isinstance(request.json, list):
-        data = request.json
-    else:
-        data = [request.json]
+    logger.debug(
+        f'update_computer, session_uuid: {session_uuid}, size : {sys.getsizeof(str(request.json)) / 1024} Kb')
+
+    return utils.json_response({'errors': errors, 'url': c.url})
+
+
+@unit_of_work
+def apply_computer_push(data: typing.List[typing.Dict[str, any]]) -> None:
+    token = request.args.get('labml_token', '')
+    if not project.ProjectIndex.get(token):
+        token = settings.FLOAT_PROJECT_TOKEN
+
+    _apply_computer_update(token, data)
+
+
+def _apply_computer_update(token: str, data: typing.List[typing.Dict[str, any]]) -> computer.Computer:
+    session_uuid = request.args.get('session_uuid', '')
+    computer_uuid = request.args.get('computer_uuid', '')
+
+    c = computer.get_or_create(session_uuid, computer_uuid, token, request.remote_addr)
+    s = identity_map.load(c.status)
 
     for d in data:
         c.update_computer(d)
         s.update_time_status(d)
-        if 'track' in d:
-            AnalysisManager.track_computer(session_uuid, d['track'])
 
-    logger.debug(
-        f'update_computer, session_uuid: {session_uuid}, size : {sys.getsizeof(str(request.json)) / 1024} Kb')
+    track = AnalysisManager.merge_tracks([d['track'] for d in data if 'track' in d])
+    if track:
+        AnalysisManager.track_computer(session_uuid, track)
 
-    return jsonify({'errors': errors, 'url': c.url})
+    return c
 
 
 def claim_computer(session_uuid: str, c: computer.Computer) -> None:
@@ -140,12 +200,9 @@ def claim_computer(session_uuid: str, c: computer.Computer) -> None:
 
     default_project = s.user.load().default_project
 
-    if session_uuid not in default_project.computers:
-        float_project = project.get_project(labml_token=settings.FLOAT_PROJECT_TOKEN)
-
-        if session_uuid in float_project.computers:
-            default_project.computers[session_uuid] = c.key
-            default_project.save()
+    if not project.get_member(default_project.labml_token, listing.COMPUTERS, session_uuid):
+        if project.get_member(settings.FLOAT_PROJECT_TOKEN, listing.COMPUTERS, session_uuid):
+            project.add_member(default_project.labml_token, listing.COMPUTERS, session_uuid, c.key, c.start_time)
             c.is_claimed = True
             c.save()
 
@@ -176,28 +233,38 @@ def get_computer(session_uuid: str) -> flask.Response:
 @mix_panel.MixPanelEvent.time_this(None)
 def get_computers(labml_token: str) -> flask.Response:
     u = auth.get_auth_user()
+    limit = request.args.get('limit', None, type=int)
+    cursor = request.args.get('cursor', None)
+
+    if limit is not None and limit < 1:
+        response = make_response(utils.format_rv({'error': 'invalid_limit',
+                                                  'message': 'Limit should be at least 1'}))
+        response.status_code = 400
+
+        return response
 
     if labml_token:
-        computers_list = computer.get_computers(labml_token)
+        computers_list, cursor = computer.get_computers(labml_token, limit, cursor)
     else:
         default_project = u.default_project
         labml_token = default_project.labml_token
-        computers_list = default_project.get_computers()
+        computers_list, cursor = default_project.get_computers(limit, cursor)
+
+    statuses = load_many(c.status for c in computers_list)
+    run_statuses = load_many(s.run_status for s in statuses)
 
     res = []
-    for c in computers_list:
-        s = computer.get_status(c.session_uuid)
+    for c, s, run_status in zip(computers_list, statuses, run_statuses):
         if c.session_uuid:
-            res.append({**c.get_summary(), **s.get_data()})
-
-    res = sorted(res, key=lambda i: i['start_time'], reverse=True)
+            res.append({**c.get_summary(), **s.get_data(run_status)})
 
     logger.debug(f'computers, labml_token : {labml_token}')
 
-    return utils.format_rv({'computers': res, 'labml_token': labml_token})
+    return utils.format_rv({'computers': res, 'labml_token': labml_token, 'cursor': cursor})
 
 
 @mix_panel.MixPanelEvent.time_this(0.4)
+@unit_of_work
 def update_run() -> flask.Response:
     errors = []
 
@@ -209,14 +276,29 @@ def update_run() -> flask.Response:
         error = {'error': 'invalid_run_uuid',
                  'message': f'Invalid Run UUID'}
         errors.append(error)
-        return jsonify({'errors': errors})
+        return utils.json_response({'errors': errors})
 
     if utils.check_version(version, settings.LABML_VERSION):
         error = {'error': 'labml_outdated',
                  'message': f'Your labml client is outdated, please upgrade: '
                             'pip install labml --upgrade'}
         errors.append(error)
-        return jsonify({'errors': errors})
+        return utils.json_response({'errors': errors})
+
+    if ingestion.is_enabled():
+        data = get_queued_push_data()
+        if data is None:
+            error = {'error': 'invalid_data',
+                     'message': f'Invalid push data'}
+            errors.append(error)
+            return utils.json_response({'errors': errors})
+
+        if not project.ProjectIndex.get(token) and not run.RunIndex.get(run_uuid):
+            errors.append(get_token_error())
+
+        ingestion.push(ingestion.RUN, run_uuid, data)
+
+        return utils.json_response({'errors': errors, 'url': run.get_url(run_uuid)})
 
     p = project.get_project(labml_token=token)
     if not p:
@@ -224,35 +306,40 @@ def update_run() -> flask.Response:
 
     r = run.get(run_uuid, token)
     if not r and not p:
-        if request.args.get('labml_token', ''):
-            error = {'error': 'invalid_token',
-                     'message': 'Please create a valid token at https://web.lab-ml.com.\n'
-                                'Click on the experiment link to monitor the experiment and '
-                                'add it to your experiments list.'}
-        else:
-            error = {'warning': 'empty_token',
-                     'message': 'Please create a valid token at https://web.lab-ml.com.\n'
-                                'Click on the experiment link to monitor the experiment and '
-                                'add it to your experiments list.'}
-        errors.append(error)
+        errors.append(get_token_error())
 
-    r = run.get_or_create(run_uuid, token, request.remote_addr)
-    s = r.status.load()
+    r = _apply_run_update(token, get_push_data())
 
-    if isinstance(request.json, list):
-        data = request.json
-    else:
-        data = [request.json]
+    logger.debug(f'update_run, run_uuid: {run_uuid}, size : {sys.getsizeof(str(request.json)) / 1024} Kb')
+
+    return utils.json_response({'errors': errors, 'url': r.url})
+
+
+@unit_of_work
+def apply_run_push(data: typing.List[typing.Dict[str, any]]) -> None:
+    token = request.args.get('labml_token', '')
+    if not project.ProjectIndex.get(token):
+        token = settings.FLOAT_PROJECT_TOKEN
+
+    _apply_run_update(token, data)
+
+
+def _apply_run_update(token: str, data: typing.List[typing.Dict[str, any]]) -> run.Run:
+    run_uuid = request.args.get('run_uuid', '')
+
+    r = run.get_or_create(run_uuid, token, request.remote_addr)
+    s = identity_map.load(r.status)
 
     for d in data:
         r.update_run(d)
         s.update_time_status(d)
-        if 'track' in d:
-            AnalysisManager.track(run_uuid, d['track'])
+    run_summary.save(r, s)
 
-    logger.debug(f'update_run, run_uuid: {run_uuid}, size : {sys.getsizeof(str(request.json)) / 1024} Kb')
+    track = AnalysisManager.merge_tracks([d['track'] for d in data if 'track' in d])
+    if track:
+        AnalysisManager.track(run_uuid, track)
 
-    return jsonify({'errors': errors, 'url': r.url})
+    return r
 
 
 def claim_run(run_uuid: str, r: run.Run) -> None:
@@ -263,11 +350,9 @@ def claim_run(run_uuid: str, r: run.Run) -> None:
 
     default_project = s.user.load().default_project
 
-    if run_uuid not in default_project.runs:
-        float_project = project.get_project(labml_token=settings.FLOAT_PROJECT_TOKEN)
-
-        if run_uuid in float_project.runs:
-            default_project.runs[run_uuid] = r.key
+    if not project.get_member(default_project.labml_token, listing.RUNS, run_uuid):
+        if project.get_member(settings.FLOAT_PROJECT_TOKEN, listing.RUNS, run_uuid):
+            project.add_member(default_project.labml_token, listing.RUNS, run_uuid, r.key, r.start_time)
             default_project.is_run_added = True
             default_project.save()
             r.is_claimed = True
@@ -297,6 +382,24 @@ def get_run(run_uuid: str) -> flask.Response:
     return response
 
 
+@mix_panel.MixPanelEvent.time_this(None)
+def get_run_output(run_uuid: str, output_type: str) -> flask.Response:
+    output_data = {}
+    status_code = 400
+
+    r = run.get_run(run_uuid)
+    if r:
+        output_data = r.get_output(output_type, request.args.get('from_offset', 0, type=int))
+        status_code = 200
+
+    response = make_response(utils.format_rv(output_data))
+    response.status_code = status_code
+
+    logger.debug(f'run_output, run_uuid: {run_uuid}, type: {output_type}')
+
+    return response
+
+
 def edit_run(run_uuid: str) -> flask.Response:
     r = run.get_run(run_uuid)
 
@@ -351,25 +454,31 @@ def get_computer_status(session_uuid: str) -> flask.Response:
 @auth.check_labml_token_permission
 def get_runs(labml_token: str) -> flask.Response:
     u = auth.get_auth_user()
+    limit = request.args.get('limit', None, type=int)
+    cursor = request.args.get('cursor', None)
+
+    if limit is not None and limit < 1:
+        response = make_response(utils.format_rv({'error': 'invalid_limit',
+                                                  'message': 'Limit should be at least 1'}))
+        response.status_code = 400
+
+        return response
 
     if labml_token:
-        runs_list = run.get_runs(labml_token)
+        summaries, cursor = run.get_run_summaries(labml_token, limit, cursor)
     else:
         default_project = u.default_project
         labml_token = default_project.labml_token
-        runs_list = default_project.get_runs()
+        summaries, cursor = default_project.get_run_summaries(limit, cursor)
 
     res = []
-    for r in runs_list:
-        s = run.get_status(r.run_uuid)
-        if r.run_uuid:
-            res.append({**r.get_summary(), **s.get_data()})
-
-    res = sorted(res, key=lambda i: i['start_time'], reverse=True)
+    for summary in summaries:
+        if summary.run_uuid:
+            res.append(summary.get_data())
 
     logger.debug(f'runs, labml_token : {labml_token}')
 
-    return utils.format_rv({'runs': res, 'labml_token': labml_token})
+    return utils.format_rv({'runs': res, 'labml_token': labml_token, 'cursor': cursor})
 
 
 @mix_panel.MixPanelEvent.time_this(None)
@@ -440,6 +549,7 @@ def add_handlers(app: flask.Flask):
 
     _add_ui(app, 'GET', get_run, 'run/<run_uuid>')
     _add_ui(app, 'POST', edit_run, 'run/<run_uuid>')
+    _add_ui(app, 'GET', get_run_output, 'run/<run_uuid>/<any(stdout, logger, stderr):output_type>')
     _add_ui(app, 'GET', get_computer, 'computer/<session_uuid>')
     _add_ui(app, 'GET', get_run_status, 'run/status/<run_uuid>')
     _add_ui(app, 'GET', get_computer_status, 'computer/status/<session_uuid>')
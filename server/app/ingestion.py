@@ -0,0 +1,219 @@
+"""
+Queued ingestion for `track` and `computer` pushes.
+
+With `settings.IS_ASYNC_INGESTION` (and Redis, so not with `IS_LOCAL_SETUP`),
+the handlers validate a push, append it to a Redis list for its run or computer and return.
+Worker threads apply everything pending for a run or computer at once, inside a request
+context rebuilt from the queued push.
+
+A worker renames the pending list to a processing list before applying it, and trims pushes off
+that list as they are applied, so pushes left by a worker that died are applied by the next one.
+
+Consecutive pushes are applied together in one unit of work, which writes nothing if it fails.
+They are then applied again one at a time, and a push that fails is logged and skipped,
+without the others. A group that failed after some of it was written is not applied again,
+since that would repeat what was written.
+"""
+import json
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import redis
+
+from flask import Flask, request
+
+from . import settings
+from .db import db
+from .db import unit_of_work
+from .logging import logger
+
+RUN = 'run'
+COMPUTER = 'computer'
+
+WORKERS = 2
+# a worker that holds a run longer than this is assumed to have died
+LOCK_TIMEOUT = 5 * 60
+# pushes applied later than this after arriving are logged as errors
+LAG_LIMIT = 60
+
+READY_KEY = 'ingestion:ready'
+PENDING_PREFIX = 'ingestion:pending:'
+PROCESSING_PREFIX = 'ingestion:processing:'
+LOCK_PREFIX = 'ingestion:lock:'
+
+
+class Push(NamedTuple):
+    path: str
+    args: List[Tuple[str, str]]
+    remote_addr: str
+    user_agent: str
+    time: float
+
+
+def is_enabled() -> bool:
+    return settings.IS_ASYNC_INGESTION and not settings.IS_LOCAL_SETUP
+
+
+def push(kind: str, uuid: str, data: List[Dict[str, any]]) -> None:
+    """
+    Queues `data`, the current request's push for `uuid`
+    """
+    meta = Push(path=request.path,
+                args=list(request.args.items(multi=True)),
+                remote_addr=request.remote_addr,
+                user_agent=request.headers.get('User-Agent', ''),
+                time=time.time())
+    item = json.dumps(meta._asdict()) + '\n' + json.dumps(data)
+
+    name = f'{kind}:{uuid}'
+    # the first push since the pending ones were taken puts it on the ready list
+    if db.rpush(PENDING_PREFIX + name, item) == 1:
+        db.lpush(READY_KEY, name)
+
+
+def _parse(item: bytes) -> Tuple[Push, List[Dict[str, any]]]:
+    meta, body = item.decode('utf-8').split('\n', 1)
+    data = json.loads(body)
+    if not isinstance(data, list):
+        data = [data]
+
+    return Push(**json.loads(meta)), data
+
+
+def _take(name: str) -> List[Tuple[Push, List[Dict[str, any]]]]:
+    """
+    Pushes left on the processing list, or else the pending ones, moved to it.
+    Pushes that cannot be read are dropped from the list.
+    """
+    processing = PROCESSING_PREFIX + name
+    if not db.exists(processing):
+        try:
+            db.renamenx(PENDING_PREFIX + name, processing)
+        except redis.ResponseError:
+            # nothing pending
+            return []
+
+    res = []
+    for item in db.lrange(processing, 0, -1):
+        try:
+            res.append(_parse(item))
+        except Exception as e:
+            logger.error(f'ingestion, unreadable push, {name}: {e}')
+            db.lrem(processing, 1, item)
+
+    return res
+
+
+def _coalesce(pushes: List[Tuple[Push, List[Dict[str, any]]]]) -> List[Tuple[Push, List[Tuple[Push, List[Dict[str, any]]]]]]:
+    """
+    Groups consecutive pushes sent with the same arguments
+    """
+    res = []
+    for meta, data in pushes:
+        if res and res[-1][0].args == meta.args:
+            res[-1][1].append((meta, data))
+        else:
+            res.append((meta, [(meta, data)]))
+
+    return res
+
+
+class PartlyAppliedError(Exception):
+    pass
+
+
+class IngestionThread(threading.Thread):
+    def __init__(self, app: Flask, appliers: Dict[str, Callable[[List[Dict[str, any]]], None]]):
+        super().__init__(daemon=True)
+        self.app = app
+        self.appliers = appliers
+
+    def run(self):
+        while True:
+            name = None
+            try:
+                _, name = db.brpop(READY_KEY)
+                self.process(name.decode('utf-8'))
+            except Exception as e:
+                logger.error(f'ingestion failed, {name}: {e}')
+                time.sleep(1)
+
+    def apply(self, kind: str, meta: Push, data: List[Dict[str, any]]) -> None:
+        """
+        Applies `data` in a unit of work;
+        raises `PartlyAppliedError` if it failed after some of it was written
+        """
+        with self.app.test_request_context(meta.path,
+                                           method='POST',
+                                           query_string=meta.args,
+                                           headers={'User-Agent': meta.user_agent},
+                                           environ_base={'REMOTE_ADDR': meta.remote_addr}):
+            work = None
+            try:
+                with unit_of_work.begin() as work:
+                    self.appliers[kind](data)
+            except Exception as e:
+                if work is not None and work.is_written:
+                    raise PartlyAppliedError(str(e)) from e
+                raise
+
+    def apply_one(self, name: str, kind: str, meta: Push, data: List[Dict[str, any]]) -> None:
+        try:
+            self.apply(kind, meta, data)
+        except Exception as e:
+            logger.error(f'ingestion, skipped push, {name}: {e}')
+
+    def process(self, name: str):
+        lock = db.lock(LOCK_PREFIX + name, timeout=LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            # another worker is applying earlier pushes for it; come back after those
+            db.lpush(READY_KEY, name)
+            time.sleep(0.1)
+            return
+
+        try:
+            processing = PROCESSING_PREFIX + name
+            pushes = _take(name)
+            if not pushes:
+                return
+
+            kind = name.split(':', 1)[0]
+            for meta, group in _coalesce(pushes):
+                try:
+                    self.apply(kind, meta, [d for _, data in group for d in data])
+                except PartlyAppliedError as e:
+                    logger.error(f'ingestion, pushes partly applied, {name}: {e}')
+                except Exception as e:
+                    logger.error(f'ingestion, applying pushes one at a time, {name}: {e}')
+                    for m, data in group:
+                        self.apply_one(name, kind, m, data)
+                        # trimmed one by one, so that a worker that dies does not leave applied pushes
+                        db.ltrim(processing, 1, -1)
+                    continue
+                db.ltrim(processing, len(group), -1)
+            db.delete(processing)
+
+            lag = time.time() - pushes[0][0].time
+            message = f'ingestion, {name}, pushes: {len(pushes)}, lag: {"%.3fs" % lag}'
+            if lag > LAG_LIMIT:
+                logger.error(message)
+            else:
+                logger.info(message)
+
+            # pushes that arrived while the ones left by a dead worker were applied
+            if db.exists(PENDING_PREFIX + name):
+                db.lpush(READY_KEY, name)
+        finally:
+            lock.release()
+
+
+def start(app: Flask, appliers: Dict[str, Callable[[List[Dict[str, any]]], None]]) -> None:
+    # pushes left pending or half applied by a previous process;
+    # a name on the ready list twice finds nothing the second time
+    for prefix in [PROCESSING_PREFIX, PENDING_PREFIX]:
+        for key in db.scan_iter(match=prefix + '*'):
+            db.lpush(READY_KEY, key.decode('utf-8')[len(prefix):])
+
+    for _ in range(WORKERS):
+        IngestionThread(app, appliers).start()
@@ -11,3 +11,5 @@ SAMPLES_PROJECT_TOKEN = 'XXX'
 LABML_VERSION = 'XXX'
 IS_MIX_PANEL = True
 IS_LOCAL_SETUP = False
+IS_ASYNC_INGESTION = False
+IS_QUANTILE_SKETCH = False
@@ -1,9 +1,16 @@
+import json
 import time
 from typing import Any, Dict
 from uuid import uuid4
 from functools import wraps
 
-from flask import jsonify
+import numpy as np
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def check_version(user_v, new_v):
@@ -20,13 +27,44 @@ def gen_token() -> str:
     return uuid4().hex
 
 
-def format_rv(data: Any, updated: Dict[str, Any] = None):
+def get_rv(data: Any, updated: Dict[str, Any] = None) -> Dict[str, Any]:
     meta = {'is_run_added': False}
 
     if updated:
         meta.update(updated)
 
-    return jsonify({'data': data, 'meta': meta})
+    return {'data': data, 'meta': meta}
+
+
+def _to_json(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.generic):
+        return obj.item()
+
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+def dumps(data: Any) -> bytes:
+    """
+    JSON of `data`, which can hold NumPy arrays and scalars.
+    With `orjson` installed, arrays are written without going through lists.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_to_json, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(data, default=_to_json, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(data: Any):
+    """
+    Same as `flask.jsonify`, encoded with `dumps`
+    """
+    return current_app.response_class(dumps(data), mimetype='application/json')
+
+
+def format_rv(data: Any, updated: Dict[str, Any] = None):
+    return json_response(get_rv(data, updated))
 
 
 def time_this(function):
@@ -8,7 +8,9 @@ from flask import Flask, request, make_response, redirect, g
 from flask_cors import CORS, cross_origin
 
 from app import handlers
+from app import ingestion
 from app import settings
+from app.db import db, model_cache
 from app.logging import logger
 from app.utils import mix_panel
 
@@ -41,6 +43,13 @@ def create_app():
             mp_tread = mix_panel.MixPanelThread()
             mp_tread.start()
 
+        if not settings.IS_LOCAL_SETUP:
+            model_cache.start(db)
+
+        if ingestion.is_enabled():
+            ingestion.start(_app, {ingestion.RUN: handlers.apply_run_push,
+                                   ingestion.COMPUTER: handlers.apply_computer_push})
+
         logger.info('initializing app')
         logger.error(f'THIS IS NOT AN ERROR: Server Deployed SHA : {sha}')
 
@@ -0,0 +1,70 @@
+import json
+import time
+
+import numpy as np
+from flask import Flask, jsonify
+
+# the app modules are imported in the order the server imports them
+from app import handlers
+from app import utils
+from app.analyses.series import Series
+
+N_SERIES = 300
+N_STEPS = 10000
+REPEATS = 5
+
+
+def get_gradients_response():
+    series = []
+    for i in range(N_SERIES):
+        s = Series()
+        s.update(list(range(1, N_STEPS + 1)), np.random.random(N_STEPS).tolist())
+        detail = s.detail
+        detail['name'] = f'grad.fc.{i}.l2'
+        series.append(detail)
+
+    summary = [{'l1': float(np.random.random()), 'l2': float(np.random.random()), 'mean': np.float32(1.)}
+               for _ in range(N_SERIES)]
+
+    return {'series': series, 'insights': [], 'summary': summary}
+
+
+def to_lists(data):
+    if isinstance(data, np.ndarray):
+        return data.tolist()
+    elif isinstance(data, np.generic):
+        return data.item()
+    elif isinstance(data, dict):
+        return {k: to_lists(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [to_lists(v) for v in data]
+    else:
+        return data
+
+
+def measure(name, func):
+    times = []
+    size = 0
+    for _ in range(REPEATS):
+        start = time.time()
+        size = len(func())
+        times.append(time.time() - start)
+
+    print(f'{name:<24} {min(times) * 1000:8.1f}ms {size / 1e6:6.2f}MB')
+
+
+def main():
+    app = Flask(__name__)
+    data = get_gradients_response()
+
+    with app.app_context():
+        measure('jsonify with lists', lambda: jsonify({'data': to_lists(data), 'meta': {}}).get_data())
+        measure('format_rv', lambda: utils.format_rv(data).get_data())
+
+    print(f'orjson: {utils.orjson is not None}')
+    measure('json with lists', lambda: json.dumps({'data': to_lists(data), 'meta': {}}).encode('utf-8'))
+    measure('utils.dumps', lambda: utils.dumps({'data': data, 'meta': {}}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import math
+
+import numpy as np
+import pytest
+
+# the app modules are imported in the order the server imports them
+from app import handlers
+from app import settings
+from app.analyses.series import Series, SeriesQuery
+
+
+class ListSeries:
+    """
+    The list version of `Series` that the arrays replaced, as the reference
+    """
+
+    def __init__(self):
+        self.step = []
+        self.last_step = []
+        self.value = []
+        self.step_gap = 0
+
+    def update(self, steps, values):
+        self.step += list(steps)
+        self.value += list(values)
+        self.last_step += list(steps)
+
+        self.merge()
+        while len(self.last_step) > 1024:
+            self.step_gap *= 2
+            self.merge()
+
+    def merge(self):
+        if len(self.last_step) <= 1:
+            return
+
+        if not self.step_gap:
+            self.step_gap = max(b - a for a, b in zip(self.last_step, self.last_step[1:]))
+
+        i = 0
+        last_step = 0
+        for j in range(1, len(self.last_step)):
+            if self.last_step[j] - last_step < self.step_gap:
+                iw = max(1., self.last_step[i] - last_step)
+                jw = max(1., self.last_step[j] - self.last_step[i])
+                self.step[i] = (self.step[i] * iw + self.step[j] * jw) / (iw + jw)
+                self.value[i] = (self.value[i] * iw + self.value[j] * jw) / (iw + jw)
+                self.last_step[i] = self.last_step[j]
+            else:
+                last_step = self.last_step[i]
+                i += 1
+                self.last_step[i] = self.last_step[j]
+                self.step[i] = self.step[j]
+                self.value[i] = self.value[j]
+
+        del self.last_step[i + 1:], self.step[i + 1:], self.value[i + 1:]
+
+    def get_extent(self):
+        if len(self.value) == 0:
+            return [0, 0]
+        elif len(self.value) < 10:
+            return [min(self.value), max(self.value)]
+
+        values = sorted(self.value)
+        margin = int(len(values) * 0.04)
+        if margin == 0:
+            return [values[0], values[-1]]
+        std_dev = np.std(self.value[margin:-margin])
+        start = 0
+        while start < margin and values[start] + std_dev * 2 <= values[margin]:
+            start += 1
+        end = len(values) - 1
+        while end > len(values) - margin - 1 and values[end] - std_dev * 2 >= values[-margin]:
+            end -= 1
+
+        return [values[start], values[end]]
+
+    def smooth_45(self):
+        lo, hi = 1, max(1, len(self.value))
+        while lo < hi:
+            m = (lo + hi) // 2
+            if self.mean_angle(self.smooth_value(m)) > math.pi / 4:
+                lo = m + 1
+            else:
+                hi = m
+
+        return self.smooth_value(hi)
+
+    def mean_angle(self, smoothed):
+        x_range = max(self.last_step) - min(self.last_step)
+        y_extent = self.get_extent()
+        y_range = y_extent[1] - y_extent[0]
+        if x_range < 1e-9 or y_range < 1e-9:
+            return 0
+
+        angles = []
+        for i in range(len(smoothed) - 1):
+            dx = (self.last_step[i + 1] - self.last_step[i]) / x_range
+            dy = (smoothed[i + 1] - smoothed[i]) / y_range
+            angles.append(math.atan2(abs(dy) * 0.5, abs(dx)))
+
+        return np.mean(angles)
+
+    def smooth_value(self, span):
+        span_extra = span // 2
+        smoothed = []
+        for i in range(len(self.value)):
+            window = self.value[max(0, i - span_extra):i + span_extra + 1]
+            smoothed.append(sum(window) / len(window))
+
+        return smoothed
+
+
+def _get_pushes(name):
+    """
+    Pushes of steps and values, in the chunks the client sends them in
+    """
+    rng = np.random.default_rng(0)
+    if name == 'empty':
+        return []
+    elif name == 'single':
+        return [([1.], [3.])]
+    elif name == 'constant':
+        return [(list(range(i, i + 100)), [2.] * 100) for i in range(1, 3000, 100)]
+    elif name == 'irregular':
+        steps = np.cumsum(rng.integers(1, 20, 5000)).astype(float)
+        return [(steps[i:i + 37].tolist(), rng.random(len(steps[i:i + 37])).tolist())
+                for i in range(0, 5000, 37)]
+    else:
+        walk = np.cumsum(rng.normal(size=15000))
+        walk[rng.integers(0, 15000, 20)] += 1000
+        return [(list(range(i + 1, i + 101)), walk[i:i + 100].tolist()) for i in range(0, 15000, 100)]
+
+
+PUSHES = ['empty', 'single', 'constant', 'irregular', 'outliers']
+
+
+@pytest.mark.parametrize('name', PUSHES)
+def test_same_as_lists(name):
+    reference = ListSeries()
+    s = Series()
+    for steps, values in _get_pushes(name):
+        reference.update(steps, values)
+        s.update(steps, values)
+
+        assert s.step_gap == reference.step_gap
+        assert np.allclose(s.last_step, reference.last_step)
+        assert np.allclose(s.step, reference.step)
+        assert np.allclose(s.value, reference.value)
+
+    assert np.allclose(s.get_extent(True), reference.get_extent())
+    assert np.allclose(s.smooth_45(), reference.smooth_45())
+    assert np.allclose(s.detail['smoothed'], reference.smooth_45())
+
+
+@pytest.mark.parametrize('name', PUSHES)
+def test_delta(name):
+    # a client that replaces its buckets from the first one in the delta has the full series
+    s = Series()
+    client = None
+    for steps, values in _get_pushes(name):
+        s.update(steps, values)
+        if client is None:
+            client = s.select(SeriesQuery()).detail
+            continue
+
+        delta = s.select(SeriesQuery(since_step=client['step'][-1])).detail
+        if delta['is_delta']:
+            kept = client['step'] < delta['step'][0]
+            client = {k: np.concatenate((client[k][kept], delta[k])) for k in ['step', 'value', 'smoothed']}
+        else:
+            client = delta
+
+        detail = s.detail
+        for k in ['step', 'value', 'smoothed']:
+            assert np.allclose(client[k], detail[k])
+
+
+@pytest.fixture
+def quantile_sketch(monkeypatch):
+    monkeypatch.setattr(settings, 'IS_QUANTILE_SKETCH', True)
+
+
+@pytest.mark.parametrize('values', [[5.], [1.] * 3, [0.] * 50])
+def test_sketch_constant(quantile_sketch, values):
+    s = Series()
+    s.update(list(range(1, len(values) + 1)), values)
+
+    assert s.sketch is not None
+    assert s.get_extent(True) == [values[0], values[0]]
+    assert np.allclose(s.detail['smoothed'], values)
+
+
+def test_sketch_few_points(monkeypatch):
+    # with fewer than ten values the whole range is used, as without a sketch
+    values = [0., 1., 1., 1., 1., 1., 1., 1., 100.]
+    smoothed = []
+    for is_sketch in [False, True]:
+        monkeypatch.setattr(settings, 'IS_QUANTILE_SKETCH', is_sketch)
+        s = Series()
+        s.update(list(range(1, len(values) + 1)), values)
+        assert s.get_extent(True) == [0., 100.]
+        smoothed.append(s.detail['smoothed'])
+
+    assert np.allclose(smoothed[0], smoothed[1])
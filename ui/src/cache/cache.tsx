@@ -1,5 +1,5 @@
 import NETWORK from "../network"
-import {Run, SeriesDataModel} from "../models/run"
+import {getSinceStep, mergeSeriesData, OutputType, Run, RunOutput, SeriesDataModel} from "../models/run"
 import {Status} from "../models/status"
 import {RunListItemModel, RunsList} from "../models/run_list"
 import {AnalysisPreference} from "../models/preferences"
@@ -135,6 +135,44 @@ class RunCache extends CacheObject<Run> {
     }
 }
 
+class RunOutputCache extends CacheObject<RunOutput> {
+    private readonly uuid: string
+    private readonly type: OutputType
+    private statusCache: RunStatusCache
+
+    constructor(uuid: string, type: OutputType, statusCache: RunStatusCache) {
+        super()
+        this.uuid = uuid
+        this.type = type
+        this.statusCache = statusCache
+    }
+
+    async load(): Promise<RunOutput> {
+        return this.broadcastPromise.create(async () => {
+            // only the output after what is already loaded
+            let res = await NETWORK.getRunOutput(this.uuid, this.type, this.data ? this.data.offset : 0)
+            if (this.data == null) {
+                return new RunOutput(res)
+            }
+
+            this.data.append(res)
+            return this.data
+        })
+    }
+
+    async get(isRefresh = false): Promise<RunOutput> {
+        let status = await this.statusCache.get()
+
+        if (this.data == null || (status.isRunning && isReloadTimeout(this.lastUpdated)) || isRefresh) {
+            this.data = await this.load()
+            this.lastUpdated = (new Date()).getTime()
+            await this.statusCache.get(true)
+        }
+
+        return this.data
+    }
+}
+
 class ComputerCache extends CacheObject<Computer> {
     private readonly uuid: string
 
@@ -250,7 +288,7 @@ class RunsListCache extends CacheObject<RunsList> {
     }
 }
 
-export class SeriesCache extends CacheObject<SeriesDataModel[]> {
+export class SeriesCache extends CacheObject<SeriesDataModel> {
     private readonly uuid: string
     private readonly url: string
     private statusCache: RunStatusCache | ComputerStatusCache
@@ -262,13 +300,19 @@ export class SeriesCache extends CacheObject<SeriesDataModel[]> {
         this.url = url
     }
 
-    async load(): Promise<SeriesDataModel[]> {
+    async load(): Promise<SeriesDataModel> {
         return this.broadcastPromise.create(async () => {
-            return await NETWORK.getAnalysis(this.url, this.uuid)
+            if (this.data == null) {
+                return await NETWORK.getAnalysis(this.url, this.uuid)
+            }
+
+            // only the buckets that changed since what is already loaded
+            let res = await NETWORK.getAnalysis(this.url, this.uuid, getSinceStep(this.data))
+            return mergeSeriesData(this.data, res)
         })
     }
 
-    async get(isRefresh = false): Promise<SeriesDataModel[]> {
+    async get(isRefresh = false): Promise<SeriesDataModel> {
         let status = await this.statusCache.get()
 
         if (this.data == null || (status.isRunning && isReloadTimeout(this.lastUpdated)) || isRefresh) {
@@ -304,6 +348,7 @@ export class SeriesPreferenceCache extends CacheObject<AnalysisPreference> {
 
 class Cache {
     private readonly runs: { [uuid: string]: RunCache }
+    private readonly runOutputs: { [key: string]: RunOutputCache }
     private readonly computers: { [uuid: string]: ComputerCache }
     private readonly runStatuses: { [uuid: string]: RunStatusCache }
     private readonly computerStatuses: { [uuid: string]: ComputerStatusCache }
@@ -315,6 +360,7 @@ class Cache {
 
     constructor() {
         this.runs = {}
+        this.runOutputs = {}
         this.computers = {}
         this.runStatuses = {}
         this.computerStatuses = {}
@@ -332,6 +378,15 @@ class Cache {
         return this.runs[uuid]
     }
 
+    getRunOutput(uuid: string, type: OutputType) {
+        let key = `${uuid}/${type}`
+        if (this.runOutputs[key] == null) {
+            this.runOutputs[key] = new RunOutputCache(uuid, type, this.getRunStatus(uuid))
+        }
+
+        return this.runOutputs[key]
+    }
+
     getComputer(uuid: string) {
         if (this.computers[uuid] == null) {
             this.computers[uuid] = new ComputerCache(uuid)
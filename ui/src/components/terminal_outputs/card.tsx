@@ -5,7 +5,7 @@ import {useHistory} from "react-router-dom"
 import mixpanel from "mixpanel-browser"
 
 import {BasicProps, CardProps, ViewCardProps} from "../../analyses/types"
-import {Run} from "../../models/run"
+import {OutputType, RunOutput} from "../../models/run"
 import CACHE from "../../cache/cache"
 import {LabLoader} from "../utils/loader"
 import useWindowDimensions from "../../utils/window_dimensions"
@@ -19,13 +19,13 @@ import "./terminal.scss"
 
 interface StdOutCardProps extends BasicProps, CardProps {
     url: string
-    type: 'stdout' | 'logger' | 'stderr'
+    type: OutputType
 }
 
 function StdOut(props: StdOutCardProps, ref: any) {
-    const [run, setRun] = useState(null as unknown as Run)
+    const [output, setOutput] = useState(null as unknown as RunOutput)
 
-    const runCache = CACHE.getRun(props.uuid)
+    const outputCache = CACHE.getRunOutput(props.uuid, props.type)
 
     const history = useHistory()
 
@@ -33,18 +33,18 @@ function StdOut(props: StdOutCardProps, ref: any) {
 
     useEffect(() => {
         async function load() {
-            setRun(await runCache.get())
+            setOutput(await outputCache.get())
         }
 
         load().then()
-    }, [runCache])
+    }, [outputCache])
 
     async function onRefresh() {
-        setRun(await runCache.get(true))
+        setOutput(await outputCache.get(true))
     }
 
     async function onLoad() {
-        setRun(await runCache.get())
+        setOutput(await outputCache.get())
     }
 
     useImperativeHandle(ref, () => ({
@@ -54,7 +54,7 @@ function StdOut(props: StdOutCardProps, ref: any) {
         load: () => {
             onLoad().then()
         },
-        lastUpdated: runCache.lastUpdated,
+        lastUpdated: outputCache.lastUpdated,
     }))
 
     function getLastTenLines(inputStr: string) {
@@ -70,19 +70,19 @@ function StdOut(props: StdOutCardProps, ref: any) {
         return last10Lines.join("\n")
     }
 
-    return <div>{!run ?
+    return <div>{!output ?
         <div className={'labml-card labml-card-action'}>
             <h3 className={'header'}>{props.title}</h3>
             <LabLoader/>
         </div>
-        : run && run[props.type] ? <div className={'labml-card labml-card-action'} onClick={
+        : output && output.text ? <div className={'labml-card labml-card-action'} onClick={
                 () => {
                     history.push(`/${props.url}?uuid=${props.uuid}`, history.location.pathname)
                 }
             }>
                 <h3 className={'header'}>{props.title}</h3>
                 <div className={'terminal-card no-scroll'}>
-                    {run && <pre dangerouslySetInnerHTML={{__html: f.toHtml(getLastTenLines(run[props.type]))}}/>}
+                    {output && <pre dangerouslySetInnerHTML={{__html: f.toHtml(getLastTenLines(output.text))}}/>}
                 </div>
             </div>
             : <div/>
@@ -91,17 +91,17 @@ function StdOut(props: StdOutCardProps, ref: any) {
 }
 
 interface StdOutViewCardProps extends ViewCardProps {
-    type: 'stdout' | 'logger' | 'stderr'
+    type: OutputType
 }
 
 function StdOutView(props: StdOutViewCardProps) {
     const params = new URLSearchParams(props.location.search)
     const runUUID = params.get('uuid') as string
 
-    const [run, setRun] = useState(null as unknown as Run)
+    const [output, setOutput] = useState(null as unknown as RunOutput)
     const [status, setStatus] = useState(null as unknown as Status)
 
-    const runCache = CACHE.getRun(runUUID)
+    const outputCache = CACHE.getRunOutput(runUUID, props.type)
     const statusCache = CACHE.getRunStatus(runUUID)
 
     const {width: windowWidth} = useWindowDimensions()
@@ -111,7 +111,7 @@ function StdOutView(props: StdOutViewCardProps) {
 
     useEffect(() => {
         async function load() {
-            setRun(await runCache.get())
+            setOutput(await outputCache.get())
 
             let currentStatus = await statusCache.get()
             if (currentStatus && !currentStatus.isRunning) {
@@ -126,10 +126,10 @@ function StdOutView(props: StdOutViewCardProps) {
         load().then()
         let interval = setInterval(load, 2 * 60 * 1000)
         return () => clearInterval(interval)
-    }, [runCache, statusCache, runUUID, props.title])
+    }, [outputCache, statusCache, runUUID, props.title])
 
     async function load() {
-        setRun(await runCache.get(true))
+        setOutput(await outputCache.get(true))
     }
 
     function onRefresh() {
@@ -141,11 +141,11 @@ function StdOutView(props: StdOutViewCardProps) {
             <BackButton parent={props.title}/>
             {status && status.isRunning && <RefreshButton onButtonClick={onRefresh} parent={props.title}/>}
         </div>
-        <RunHeaderCard uuid={runUUID} width={actualWidth} lastUpdated={runCache.lastUpdated}/>
+        <RunHeaderCard uuid={runUUID} width={actualWidth} lastUpdated={outputCache.lastUpdated}/>
         <h2 className={'header text-center'}>{props.title}</h2>
-        {run ?
+        {output ?
             <div className={'terminal-card'}>
-                <pre dangerouslySetInnerHTML={{__html: f.toHtml(run[props.type])}}/>
+                <pre dangerouslySetInnerHTML={{__html: f.toHtml(output.text)}}/>
             </div>
             :
             <LabLoader/>
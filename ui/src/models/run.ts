@@ -14,9 +14,6 @@ export interface RunModel {
     start_step: number
     is_claimed: boolean
     configs: ConfigModel[]
-    stdout: string
-    logger: string
-    stderr: string
 }
 
 export interface PointValue {
@@ -31,6 +28,7 @@ export interface SeriesModel {
     value: number[]
     smoothed: number[]
     mean: number
+    is_delta?: boolean
     series: PointValue[]
 }
 
@@ -52,6 +50,59 @@ export interface SeriesDataModel {
     summary: any[]
 }
 
+function mergeSeriesList(current: any[], update: any[]): any[] {
+    let byName: { [name: string]: any } = {}
+    for (let s of current) {
+        byName[s.name] = s
+    }
+
+    return update.map((s) => {
+        let prev = byName[s.name]
+        if (!s.is_delta || prev == null) {
+            return s
+        }
+
+        // the update replaces the buckets from its first step onwards
+        let keep = s.step.length === 0 ? -1 : prev.step.findIndex((step: number) => step >= s.step[0])
+        if (keep === -1) {
+            keep = prev.step.length
+        }
+
+        let res = {...s}
+        for (let k of Object.keys(s)) {
+            if (Array.isArray(s[k]) && Array.isArray(prev[k])) {
+                res[k] = prev[k].slice(0, keep).concat(s[k])
+            }
+        }
+
+        return res
+    })
+}
+
+export function mergeSeriesData(current: SeriesDataModel, update: SeriesDataModel): SeriesDataModel {
+    return {
+        series: mergeSeriesList(current.series, update.series),
+        insights: update.insights,
+        summary: mergeSeriesList(current.summary, update.summary)
+    }
+}
+
+export function getSinceStep(data: SeriesDataModel): number | null {
+    // the earliest last step, so that no series misses an update
+    let since: number | null = null
+    for (let s of data.series) {
+        if (s.step.length === 0) {
+            return null
+        }
+        let last = s.step[s.step.length - 1]
+        if (since == null || last < since) {
+            since = last
+        }
+    }
+
+    return since
+}
+
 export class Run {
     run_uuid: string
     name: string
@@ -66,9 +117,6 @@ export class Run {
     start_step: number
     is_claimed: boolean
     configs: Config[]
-    stdout: string
-    logger: string
-    stderr: string
 
     constructor(run: RunModel) {
         this.run_uuid = run.run_uuid
@@ -87,9 +135,36 @@ export class Run {
         for (let c of run.configs) {
             this.configs.push(new Config(c))
         }
-        this.stdout = run.stdout
-        this.logger = run.logger
-        this.stderr = run.stderr
+    }
+}
+
+export type OutputType = 'stdout' | 'logger' | 'stderr'
+
+export interface RunOutputModel {
+    output: string
+    unmerged: string
+    offset: number
+}
+
+export class RunOutput {
+    output: string
+    unmerged: string
+    offset: number
+
+    constructor(runOutput: RunOutputModel) {
+        this.output = runOutput.output
+        this.unmerged = runOutput.unmerged
+        this.offset = runOutput.offset
+    }
+
+    append(runOutput: RunOutputModel) {
+        this.output += runOutput.output
+        this.unmerged = runOutput.unmerged
+        this.offset = runOutput.offset
+    }
+
+    get text() {
+        return this.output + this.unmerged
     }
 }
 
@@ -2,6 +2,7 @@ import axios, {AxiosInstance} from 'axios'
 
 import {User, UserModel} from "./models/user"
 import CACHE from "./cache/cache"
+import {COLUMNS_MIMETYPE, decodeColumns} from "./utils/columns"
 
 interface MetaProps {
     is_run_added: boolean
@@ -45,6 +46,10 @@ class Network {
         return this.axiosInstance.get(`/run/${run_uuid}`)
     }
 
+    async getRunOutput(run_uuid: string, type: string, from_offset: number): Promise<any> {
+        return this.axiosInstance.get(`/run/${run_uuid}/${type}`, {params: {from_offset: from_offset}})
+    }
+
     async setRun(run_uuid: string, data: object): Promise<any> {
         return this.axiosInstance.post(`/run/${run_uuid}`, data)
     }
@@ -61,8 +66,21 @@ class Network {
         return this.axiosInstance.get(`/computer/status/${computer_uuid}`)
     }
 
-    async getAnalysis(url: string, run_uuid: string): Promise<any> {
-        return this.axiosInstance.get(`/${url}/${run_uuid}`, {})
+    async getAnalysis(url: string, run_uuid: string, since_step: number | null = null): Promise<any> {
+        let params = since_step == null ? {} : {since_step: since_step}
+        // series arrays come as binary columns, decoded before the response interceptor sees them
+        return this.axiosInstance.get(`/${url}/${run_uuid}`, {
+            params: params,
+            headers: {'Accept': `${COLUMNS_MIMETYPE}, application/json;q=0.9`},
+            responseType: 'arraybuffer',
+            transformResponse: [(data: ArrayBuffer, headers: any) => {
+                // errors, and servers that do not send columns, answer with JSON
+                if ((headers['content-type'] || '').startsWith(COLUMNS_MIMETYPE)) {
+                    return decodeColumns(data)
+                }
+                return JSON.parse(new TextDecoder().decode(data))
+            }]
+        })
     }
 
     async getPreferences(url: string, run_uuid: string): Promise<any> {
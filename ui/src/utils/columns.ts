@@ -0,0 +1,55 @@
+export const COLUMNS_MIMETYPE = 'application/vnd.labml.columns'
+
+const ALIGNMENT = 8
+
+interface ColumnInfo {
+    dtype: string
+    offset: number
+    length: number
+}
+
+function readColumn(buffer: ArrayBuffer, start: number, column: ColumnInfo): number[] {
+    let offset = start + column.offset
+    let array: ArrayLike<number>
+    if (column.dtype === '<f4') {
+        array = new Float32Array(buffer, offset, column.length)
+    } else if (column.dtype === '<f8') {
+        array = new Float64Array(buffer, offset, column.length)
+    } else if (column.dtype === '<i4') {
+        array = new Int32Array(buffer, offset, column.length)
+    } else {
+        array = new Uint32Array(buffer, offset, column.length)
+    }
+
+    return Array.from(array)
+}
+
+export function decodeColumns(buffer: ArrayBuffer): any {
+    // a uint32 header length, a JSON header, and the arrays it refers to as raw little-endian columns
+    let headerLength = new DataView(buffer).getUint32(0, true)
+    let header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)))
+    let start = 4 + headerLength
+    start += (ALIGNMENT - start % ALIGNMENT) % ALIGNMENT
+
+    let columns = header.columns.map((c: ColumnInfo) => readColumn(buffer, start, c))
+
+    function restore(value: any): any {
+        if (Array.isArray(value)) {
+            return value.map(restore)
+        } else if (value != null && typeof value === 'object') {
+            if (value.__column__ != null) {
+                return columns[value.__column__]
+            }
+
+            let res: { [key: string]: any } = {}
+            for (let k of Object.keys(value)) {
+                res[k] = restore(value[k])
+            }
+            return res
+        }
+
+        return value
+    }
+
+    return {data: restore(header.data), meta: restore(header.meta)}
+}